@@ -0,0 +1,171 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_API_URL = "https://api.airtable.com/v0"
+LOCAL_API_URL = "http://airtable.local/v0"
+PAGE_SIZE = 100
+BATCH_SIZE = 10  # Airtable's limit per create or update call
+RATE_LIMIT_BACKOFF = 30  # Airtable asks clients to wait 30s after a 429
+
+
+class AirtableError(Exception):
+    """Airtable answered a read with something other than 200."""
+
+    def __init__(self, response):
+        super().__init__(f"Airtable returned {response.status_code}: {response.text[:200]}")
+        self.status_code = response.status_code
+        try:
+            self.error = response.json().get("error")
+        except ValueError:
+            self.error = response.text
+
+
+def retry_after(response):
+    """Seconds a 429 response asks the client to wait."""
+    try:
+        return float(response.headers.get("Retry-After", RATE_LIMIT_BACKOFF))
+    except ValueError:
+        return RATE_LIMIT_BACKOFF
+
+
+class AirtableClient:
+    """Single entry point for every Airtable call the backend makes.
+
+    One ``requests.Session`` keeps a pool of keep-alive connections to the
+    API, so calls after the first skip the TCP and TLS handshakes. Every
+    call has a timeout, and idempotent reads are retried on gateway errors.
+    ``api_url`` can point at another host, or at ``local://`` to use the
+    in-process stand-in from ``airtable_local``.
+
+    ``observer(method, table, status, seconds)`` is called after every call,
+    with ``status`` set to ``"error"`` when no response came back.
+
+    ``list``/``list_all`` wait out up to ``rate_limit_retries`` 429s, as long
+    as ``Retry-After`` asks, and raise ``AirtableError`` on any other
+    failure, so a table is never mistaken for the pages read before it.
+    ``create_batches``/``update_batches`` split bulk writes into calls of
+    ``BATCH_SIZE`` records with the same 429 handling.
+    """
+
+    def __init__(self, base_id, token, api_url=DEFAULT_API_URL, pool_size=20, timeout=(3.05, 30), observer=None, rate_limit_retries=3):
+        self.base_id = base_id
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.observer = observer
+        self.pool_size = pool_size
+        self.rate_limit_retries = rate_limit_retries
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {token}"})
+        self.local = None
+        if self.api_url.startswith("local://"):
+            from airtable_local import LocalAirtable
+            # requests only encodes query params for http(s) URLs, so the
+            # stand-in is mounted on a reserved http host instead
+            self.api_url = LOCAL_API_URL
+            self.local = LocalAirtable()
+            self.session.mount(self.api_url, self.local)
+        else:
+            retries = Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504], allowed_methods=["GET"])
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retries)
+            self.session.mount(self.api_url, adapter)
+        self._fan_out = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="airtable")
+
+    def after_fork(self):
+        # Sockets and fan-out threads opened before a fork belong to the parent
+        for adapter in self.session.adapters.values():
+            adapter.close()
+        self._fan_out = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="airtable")
+
+    def url(self, table, record_id=None):
+        url = f"{self.api_url}/{self.base_id}/{quote(table, safe='')}"
+        return f"{url}/{record_id}" if record_id else url
+
+    def request(self, method, table, record_id=None, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        if self.observer is None:
+            return self.session.request(method, self.url(table, record_id), **kwargs)
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = self.session.request(method, self.url(table, record_id), **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            self.observer(method, table, status, time.perf_counter() - started)
+
+    def get(self, table, record_id=None, params=None):
+        return self.request("GET", table, record_id, params=params)
+
+    def post(self, table, json):
+        return self.request("POST", table, json=json)
+
+    def put(self, table, record_id, fields):
+        return self.request("PUT", table, record_id, json={"fields": fields})
+
+    def delete(self, table, record_id):
+        return self.request("DELETE", table, record_id)
+
+    def rate_limited(self, call, *args, **kwargs):
+        """Make ``call`` and repeat it after each 429, sleeping as long as
+        ``Retry-After`` asks; the last response is returned either way."""
+        for _ in range(self.rate_limit_retries):
+            response = call(*args, **kwargs)
+            if response.status_code != 429:
+                return response
+            wait = retry_after(response)
+            print(f"⏳ Airtable rate limit hit, waiting {wait}s")
+            time.sleep(wait)
+        return call(*args, **kwargs)
+
+    def list(self, table, params=None):
+        """Fetch a single page of records and return the decoded body."""
+        response = self.rate_limited(self.get, table, params=params)
+        if response.status_code != 200:
+            raise AirtableError(response)
+        return response.json()
+
+    def list_all(self, table, params=None):
+        """Follow ``offset`` until every matching record has been fetched."""
+        params = dict(params or {})
+        params.setdefault("pageSize", PAGE_SIZE)
+        records = []
+        while True:
+            data = self.list(table, params)
+            records.extend(data.get("records", []))
+            if not data.get("offset"):
+                return records
+            params["offset"] = data["offset"]
+
+    def create_records(self, table, records, upsert_on=None):
+        data = {"records": [{"fields": fields} for fields in records]}
+        if upsert_on:
+            data["performUpsert"] = {"fieldsToMergeOn": [upsert_on]}
+            return self.request("PATCH", table, json=data)
+        return self.request("POST", table, json=data)
+
+    def update_records(self, table, records):
+        """PATCH up to ten ``{"id": ..., "fields": ...}`` records in one call."""
+        return self.request("PATCH", table, json={"records": records})
+
+    def create_batches(self, table, records, upsert_on=None):
+        """Create ``records`` ``BATCH_SIZE`` at a time, yielding each chunk
+        with its response once any 429s have been waited out."""
+        for start in range(0, len(records), BATCH_SIZE):
+            chunk = records[start:start + BATCH_SIZE]
+            yield chunk, self.rate_limited(self.create_records, table, chunk, upsert_on)
+
+    def update_batches(self, table, records):
+        """``create_batches`` for ``{"id": ..., "fields": ...}`` updates."""
+        for start in range(0, len(records), BATCH_SIZE):
+            chunk = records[start:start + BATCH_SIZE]
+            yield chunk, self.rate_limited(self.update_records, table, chunk)
+
+    def fan_out(self, *calls):
+        """Run independent zero-argument calls concurrently, results in order."""
+        futures = [self._fan_out.submit(call) for call in calls]
+        return [future.result() for future in futures]
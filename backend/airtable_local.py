@@ -0,0 +1,343 @@
+"""In-process Airtable stand-in for offline runs and load tests.
+
+``LocalAirtable`` is a ``requests`` transport adapter, so the backend talks to
+it through the same ``AirtableClient`` it uses in production. It keeps tables
+in memory and understands the slice of the REST API the app relies on:
+list with ``filterByFormula``/``sort``/``pageSize``/``offset``/``fields[]``,
+get, create (single and batched), update, upsert and delete.
+
+The formula support covers the functions the backend builds: ``AND``,
+``OR``, ``NOT``, ``FIND``, ``LOWER``, ``IS_AFTER``, ``IS_BEFORE``,
+``LAST_MODIFIED_TIME`` and the comparison operators. Field names are matched
+case-insensitively.
+"""
+import datetime
+import json
+import random
+import re
+import string
+import threading
+from urllib.parse import unquote, urlsplit, parse_qsl
+
+import requests
+from requests.adapters import BaseAdapter
+
+PAGE_SIZE = 100
+MAX_BATCH = 10
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _record_id():
+    return "rec" + "".join(random.choices(string.ascii_letters + string.digits, k=14))
+
+
+def _parse_time(value):
+    try:
+        return datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _field(record, name):
+    fields = record["fields"]
+    if name in fields:
+        return fields[name]
+    lowered = name.lower()
+    for key, value in fields.items():
+        if key.lower() == lowered:
+            return value
+    return None
+
+
+# Formulas -------------------------------------------------------------------
+
+TOKEN = re.compile(r"\s*(?:(\{[^}]*\})|'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\"|(\d+(?:\.\d+)?)|([A-Za-z_]+)|(<=|>=|!=|[=<>(),&]))")
+
+
+def _tokenize(formula):
+    tokens = []
+    position = 0
+    formula = formula.strip()
+    while position < len(formula):
+        match = TOKEN.match(formula, position)
+        if not match:
+            raise ValueError(f"Unsupported formula near: {formula[position:]}")
+        field, single, double, number, name, symbol = match.groups()
+        if field is not None:
+            tokens.append(("field", field[1:-1]))
+        elif single is not None or double is not None:
+            tokens.append(("string", single if single is not None else double))
+        elif number is not None:
+            tokens.append(("number", float(number)))
+        elif name is not None:
+            tokens.append(("name", name.upper()))
+        else:
+            tokens.append(("symbol", symbol))
+        position = match.end()
+    return tokens
+
+
+def _compare(op, left, right):
+    if not (isinstance(left, (int, float)) and isinstance(right, (int, float))):
+        left = "" if left is None else str(left)
+        right = "" if right is None else str(right)
+    if op == "=":
+        return left == right
+    if op == "!=":
+        return left != right
+    if op == "<":
+        return left < right
+    if op == ">":
+        return left > right
+    if op == "<=":
+        return left <= right
+    return left >= right
+
+
+FUNCTIONS = {
+    "AND": lambda *args: all(args),
+    "OR": lambda *args: any(args),
+    "NOT": lambda value: not value,
+    "LOWER": lambda value: "" if value is None else str(value).lower(),
+    "UPPER": lambda value: "" if value is None else str(value).upper(),
+    "FIND": lambda needle, haystack: ("" if haystack is None else str(haystack)).find(str(needle)) + 1,
+    "IS_AFTER": lambda a, b: bool(_parse_time(a) and _parse_time(b) and _parse_time(a) > _parse_time(b)),
+    "IS_BEFORE": lambda a, b: bool(_parse_time(a) and _parse_time(b) and _parse_time(a) < _parse_time(b)),
+}
+
+
+class _Parser:
+    def __init__(self, formula):
+        self.tokens = _tokenize(formula)
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if (kind and token[0] != kind) or (value and token[1] != value):
+            raise ValueError(f"Unexpected token {token[1]!r} in formula")
+        self.position += 1
+        return token
+
+    def parse(self):
+        node = self.expression()
+        if self.position != len(self.tokens):
+            raise ValueError("Trailing tokens in formula")
+        return node
+
+    def expression(self):
+        left = self.concat()
+        kind, value = self.peek()
+        if kind == "symbol" and value in ("=", "!=", "<", ">", "<=", ">="):
+            self.take()
+            right = self.concat()
+            return lambda record: _compare(value, left(record), right(record))
+        return left
+
+    def concat(self):
+        left = self.term()
+        while self.peek() == ("symbol", "&"):
+            self.take()
+            right, prev = self.term(), left
+            left = lambda record, l=prev, r=right: f"{l(record) or ''}{r(record) or ''}"
+        return left
+
+    def term(self):
+        kind, value = self.take()
+        if kind == "field":
+            return lambda record: _field(record, value)
+        if kind in ("string", "number"):
+            return lambda record: value
+        if kind == "name":
+            if value in ("TRUE", "FALSE") and self.peek() != ("symbol", "("):
+                return lambda record: value == "TRUE"
+            self.take("symbol", "(")
+            args = []
+            if self.peek() != ("symbol", ")"):
+                args.append(self.expression())
+                while self.peek() == ("symbol", ","):
+                    self.take()
+                    args.append(self.expression())
+            self.take("symbol", ")")
+            if value == "LAST_MODIFIED_TIME":
+                return lambda record: record["_modified"]
+            if value not in FUNCTIONS:
+                raise ValueError(f"Unsupported function {value}")
+            function = FUNCTIONS[value]
+            return lambda record: function(*(arg(record) for arg in args))
+        if (kind, value) == ("symbol", "("):
+            node = self.expression()
+            self.take("symbol", ")")
+            return node
+        raise ValueError(f"Unexpected token {value!r} in formula")
+
+
+def compile_formula(formula):
+    return _Parser(formula).parse()
+
+
+# Transport ------------------------------------------------------------------
+
+class LocalAirtable(BaseAdapter):
+    def __init__(self):
+        super().__init__()
+        self.tables = {}
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return self.tables.setdefault(name, {})
+
+    def insert(self, table, fields, record_id=None, created_time=None):
+        """Seed a record directly, bypassing HTTP; returns the public record."""
+        with self._lock:
+            return self._public(self._insert(table, fields, record_id, created_time))
+
+    def _insert(self, table, fields, record_id=None, created_time=None):
+        now = _now()
+        record = {
+            "id": record_id or _record_id(),
+            "createdTime": created_time or now,
+            "fields": {key: value for key, value in fields.items() if value is not None},
+            "_modified": now,
+        }
+        self.table(table)[record["id"]] = record
+        return record
+
+    @staticmethod
+    def _public(record, fields=None):
+        data = record["fields"]
+        if fields:
+            data = {key: value for key, value in data.items() if key in fields}
+        return {"id": record["id"], "createdTime": record["createdTime"], "fields": dict(data)}
+
+    def close(self):
+        pass
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        query = parse_qsl(url.query, keep_blank_values=True)
+        body = json.loads(request.body) if request.body else {}
+        # http://airtable.local/v0/<base>/<table>[/<record>]
+        table = parts[2] if len(parts) > 2 else ""
+        record_id = parts[3] if len(parts) > 3 else None
+        try:
+            with self._lock:
+                status, payload = self._dispatch(request.method, table, record_id, query, body)
+        except ValueError as e:
+            status, payload = 422, {"error": {"type": "INVALID_REQUEST", "message": str(e)}}
+        return self._response(request, status, payload)
+
+    def _dispatch(self, method, table, record_id, query, body):
+        records = self.table(table)
+        if record_id:
+            record = records.get(record_id)
+            if record is None:
+                return 404, {"error": "NOT_FOUND"}
+            if method == "GET":
+                return 200, self._public(record)
+            if method == "DELETE":
+                del records[record_id]
+                return 200, {"deleted": True, "id": record_id}
+            if method in ("PUT", "PATCH"):
+                self._update(record, body.get("fields", {}), replace=method == "PUT")
+                return 200, self._public(record)
+        elif method == "GET":
+            return 200, self._list(records, query)
+        elif method == "POST":
+            if "records" in body:
+                self._check_batch(body["records"])
+                return 200, {"records": [self._public(self._insert(table, item.get("fields", {}))) for item in body["records"]]}
+            return 200, self._public(self._insert(table, body.get("fields", {})))
+        elif method in ("PATCH", "PUT"):
+            self._check_batch(body.get("records", []))
+            return 200, {"records": [self._public(record) for record in self._update_many(table, body, method == "PUT")]}
+        elif method == "DELETE":
+            ids = [value for key, value in query if key == "records[]"]
+            for existing in ids:
+                records.pop(existing, None)
+            return 200, {"records": [{"id": existing, "deleted": True} for existing in ids]}
+        return 405, {"error": "METHOD_NOT_ALLOWED"}
+
+    @staticmethod
+    def _check_batch(items):
+        if len(items) > MAX_BATCH:
+            raise ValueError(f"At most {MAX_BATCH} records per request")
+
+    @staticmethod
+    def _update(record, fields, replace=False):
+        if replace:
+            record["fields"] = {}
+        for key, value in fields.items():
+            if value is None:
+                record["fields"].pop(key, None)
+            else:
+                record["fields"][key] = value
+        record["_modified"] = _now()
+
+    def _update_many(self, table, body, replace):
+        records = self.table(table)
+        merge_on = (body.get("performUpsert") or {}).get("fieldsToMergeOn")
+        updated = []
+        for item in body.get("records", []):
+            fields = item.get("fields", {})
+            record = records.get(item.get("id"))
+            if record is None and merge_on:
+                record = next(
+                    (existing for existing in records.values()
+                     if all(_field(existing, name) == fields.get(name) for name in merge_on)),
+                    None,
+                )
+                if record is None:
+                    updated.append(self._insert(table, fields))
+                    continue
+            if record is None:
+                raise ValueError(f"Record {item.get('id')} not found")
+            self._update(record, fields, replace)
+            updated.append(record)
+        return updated
+
+    def _list(self, records, query):
+        params = dict(query)
+        rows = list(records.values())
+        if params.get("filterByFormula"):
+            predicate = compile_formula(params["filterByFormula"])
+            rows = [record for record in rows if predicate(record)]
+
+        sorts = []
+        index = 0
+        while f"sort[{index}][field]" in params:
+            sorts.append((params[f"sort[{index}][field]"], params.get(f"sort[{index}][direction]", "asc")))
+            index += 1
+        for field, direction in reversed(sorts):
+            rows.sort(
+                key=lambda record: (_field(record, field) is not None, str(_field(record, field) or "")),
+                reverse=direction == "desc",
+            )
+
+        if params.get("maxRecords"):
+            rows = rows[:int(params["maxRecords"])]
+        page_size = min(int(params.get("pageSize") or PAGE_SIZE), PAGE_SIZE)
+        start = int(params.get("offset") or 0)
+        page = rows[start:start + page_size]
+        fields = [value for key, value in query if key == "fields[]"] or None
+        payload = {"records": [self._public(record, fields) for record in page]}
+        if start + page_size < len(rows):
+            payload["offset"] = str(start + page_size)
+        return payload
+
+    @staticmethod
+    def _response(request, status, payload):
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(payload).encode()
+        response.headers["Content-Type"] = "application/json"
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
@@ -1,23 +1,48 @@
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, request, jsonify, make_response, g, Response, stream_with_context, has_request_context
 from flask_cors import CORS
-import face_recognition
+from werkzeug.exceptions import BadRequest, HTTPException
 import numpy as np
 import base64
 from cryptography.fernet import Fernet
-import requests
 import datetime
 from dotenv import load_dotenv
 import os
-import io
-from PIL import Image
 import random
-import pytz
+import json
+import gzip
+import hashlib
+import time
+import zipfile
+import zlib
+import threading
+import uuid
 from collections import defaultdict
+from contextlib import contextmanager
+from face_index import FaceIndex
+from encoding_snapshot import EncodingSnapshot
+import face_pipeline
+from face_pool import FacePool, PoolRestarting, PoolSaturated
+from frame_quality import DEFAULT_THRESHOLDS, FrameRejected
+from frame_cache import FrameCache, frame_hash
+from outbox import AirtableOutbox
+from airtable import AirtableClient, AirtableError, DEFAULT_API_URL
+from scan_cache import ScanCache
+from attendance_rollups import AttendanceRollups
+from mirror import AirtableMirror
+from encoding_codec import EncodingCodec
+from bulk_import import BulkImporter, ImportProgress, read_rows
+from metrics import Registry
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines run a single process
+    fcntl = None
 
 # Load .env
 load_dotenv()
 
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
 CORS(app, resources={r"/*": {"origins": [
     "http://localhost:8080",
     "https://localhost:8080",
@@ -27,95 +52,413 @@ CORS(app, resources={r"/*": {"origins": [
     "https://feasible-dove-simply.ngrok-free.app"
 ]}}, supports_credentials=True)
 
+# Latency metrics, exported at /metrics; SERVER_TIMING=1 also reports each
+# request's stages in a Server-Timing header
+metrics = Registry()
+REQUEST_SECONDS = metrics.histogram("facescan_request_seconds", "Request latency by endpoint and status", ("endpoint", "status"))
+STAGE_SECONDS = metrics.histogram("facescan_stage_seconds", "Time spent in each request stage", ("endpoint", "stage"))
+AIRTABLE_SECONDS = metrics.histogram("facescan_airtable_seconds", "Outbound Airtable call latency", ("method", "table"))
+AIRTABLE_CALLS = metrics.counter("facescan_airtable_calls_total", "Outbound Airtable calls by response status", ("method", "table", "status"))
+FRAMES_REJECTED = metrics.counter("facescan_frames_rejected_total", "Frames refused by the quality gate", ("endpoint", "reason"))
+FRAME_CACHE_LOOKUPS = metrics.counter("facescan_frame_cache_lookups_total", "Scan frames looked up in the frame cache", ("result",))
+POOL_SATURATED = metrics.counter("facescan_pool_saturated_total", "Requests turned away because the face pool was full", ("endpoint",))
+metrics.gauge("facescan_face_index_size", "Encodings held in the face index", lambda: len(face_index))
+metrics.gauge("facescan_frame_cache_entries", "Pipeline results held in the frame cache", lambda: len(frame_cache))
+metrics.gauge("facescan_outbox_pending", "Log rows waiting in the outbox", lambda: airtable_outbox.pending())
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+def record_stage(stage, seconds):
+    if has_request_context():
+        STAGE_SECONDS.observe(seconds, request.endpoint, stage)
+        g.setdefault("timings", []).append((stage, seconds))
+    else:
+        STAGE_SECONDS.observe(seconds, "background", stage)
+
+@contextmanager
+def timed(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+def observe_airtable(method, table, status, seconds):
+    AIRTABLE_SECONDS.observe(seconds, method, table)
+    AIRTABLE_CALLS.inc(method, table, str(status))
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    if "request_started" in g:
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_started, request.endpoint or "unknown", str(response.status_code))
+    if SERVER_TIMING and g.get("timings"):
+        totals = defaultdict(float)
+        for stage, seconds in g.timings:
+            totals[stage] += seconds
+        response.headers["Server-Timing"] = ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in totals.items())
+    return response
+
 # Airtable configs
 AIRTABLE_PAT = os.getenv("AIRTABLE_PAT")
 AIRTABLE_BASE_ID = os.getenv("AIRTABLE_BASE_ID")
 AIRTABLE_TABLE_NAME = os.getenv("AIRTABLE_TABLE_NAME")               # Registration table
 AIRTABLE_LOGS_TABLE_NAME = os.getenv("AIRTABLE_LOGS_TABLE_NAME")     # Logs table
 
+# All Airtable traffic shares one pooled client; AIRTABLE_API_URL=local://airtable
+# swaps in the in-process stand-in for offline runs and load tests
+airtable = AirtableClient(
+    AIRTABLE_BASE_ID,
+    AIRTABLE_PAT,
+    api_url=os.getenv("AIRTABLE_API_URL", DEFAULT_API_URL),
+    pool_size=int(os.getenv("AIRTABLE_POOL_SIZE", 20)),
+    timeout=(3.05, float(os.getenv("AIRTABLE_TIMEOUT", 30))),
+    observer=observe_airtable,
+)
+
 # Encryption
 if not os.path.exists("secret.key"):
     with open("secret.key", "wb") as f:
         f.write(Fernet.generate_key())
 
-with open("secret.key", "rb") as f:
-    encryption_key = f.read()
+# Encodings are stored through the codec: the first key of ENCRYPTION_KEYRING
+# (or secret.key when there is no keyring) in ENCODING_FORMAT ("f32" or "i8");
+# legacy float64 records and older keys are still read
+codec = EncodingCodec(
+    os.getenv("ENCRYPTION_KEYRING", "secret.keyring"),
+    legacy_key_path="secret.key",
+    format=os.getenv("ENCODING_FORMAT", "f32"),
+)
+
+# Same threshold the original compare_faces calls used
+MATCH_TOLERANCE = 0.45
+
+# Face detection/encoding runs on a bounded pool of worker processes
+FACE_POOL_WORKERS = int(os.getenv("FACE_POOL_WORKERS", os.cpu_count() or 1))
+face_pool = FacePool(
+    workers=FACE_POOL_WORKERS,
+    queue_depth=int(os.getenv("FACE_POOL_QUEUE_DEPTH", 2 * max(FACE_POOL_WORKERS, 1))),
+    retry_after=int(os.getenv("FACE_POOL_RETRY_AFTER", 1)),
+    timeout=float(os.getenv("FACE_POOL_TIMEOUT", 30)),
+)
 
-cipher = Fernet(encryption_key)
+# Frame-quality gate run before detection; FRAME_QUALITY_<THRESHOLD> overrides
+# a default from frame_quality.DEFAULT_THRESHOLDS, FRAME_QUALITY=0 disables it
+def quality_thresholds():
+    if os.getenv("FRAME_QUALITY", "1") == "0":
+        return None
+    return {
+        key: type(default)(os.getenv(f"FRAME_QUALITY_{key.upper()}", default))
+        for key, default in DEFAULT_THRESHOLDS.items()
+    }
+
+# Per-endpoint preprocessing: detector model ("hog" or "cnn"), upsampling and
+# the size frames are shrunk to before detection
+def face_options(endpoint):
+    prefix = f"FACE_{endpoint.upper()}_"
+    return {
+        "model": os.getenv(prefix + "MODEL", "hog"),
+        "upsample": int(os.getenv(prefix + "UPSAMPLE", 1)),
+        "max_side": int(os.getenv(prefix + "MAX_SIDE", 640)),
+        "target_face_px": int(os.getenv(prefix + "TARGET_FACE_PX", 150)),
+        "quality": quality_thresholds(),
+    }
+
+FACE_OPTIONS = {
+    "register": face_options("register"),
+    "scan": face_options("scan"),
+}
+
+# Near-identical scan frames from the same client reuse the last embedding;
+# FRAME_CACHE_TTL=0 turns this off
+frame_cache = FrameCache(
+    ttl=float(os.getenv("FRAME_CACHE_TTL", 3)),
+    max_clients=int(os.getenv("FRAME_CACHE_MAX_CLIENTS", 256)),
+    max_distance=int(os.getenv("FRAME_CACHE_MAX_DISTANCE", 3)),
+)
 
 # Helper functions
 def decode_base64_image(base64_str):
-    img_data = base64.b64decode(base64_str.split(',')[1])
-    img = Image.open(io.BytesIO(img_data))
-    return np.array(img)
+    return base64.b64decode(base64_str[base64_str.index(',') + 1:])
+
+RAW_IMAGE_TYPES = ("image/jpeg", "image/png", "image/webp", "application/octet-stream")
+
+def read_frame_request():
+    """Return the request fields and raw image bytes.
+
+    Frames can arrive as the original JSON body with a base64 data URL, as
+    multipart/form-data with an ``image`` file part, or as a raw image body
+    with the other fields in the query string.
+    """
+    if request.mimetype in RAW_IMAGE_TYPES:
+        data = request.args.to_dict()
+        image_bytes = request.get_data(cache=False)
+    elif request.mimetype == "multipart/form-data":
+        data = request.form.to_dict()
+        image = request.files.get("image")
+        image_bytes = image.read() if image else None
+    else:
+        data = request.get_json() or {}
+        with timed("base64_decode"):
+            image_bytes = decode_base64_image(data['image']) if data.get('image') else None
+    return data, image_bytes
+
+def parse_face_box(face_box, image_bytes=None):
+    # Optional client-side detection result in source-frame pixels; form and
+    # query-string requests send it as a JSON string
+    if face_box is None:
+        return None
+    try:
+        if isinstance(face_box, str):
+            face_box = json.loads(face_box)
+        if isinstance(face_box, dict):
+            face_box = [face_box.get(key) for key in ("top", "right", "bottom", "left")]
+        top, right, bottom, left = (int(value) for value in face_box)
+    except (TypeError, ValueError):
+        raise BadRequest("Invalid face_box")
+    if bottom <= top or right <= left or top < 0 or left < 0:
+        raise BadRequest("Invalid face_box")
+    if image_bytes is not None:
+        # Clamping a box that overhangs the frame could invert it
+        size = face_pipeline.frame_size(image_bytes)
+        if size and (right > size[0] or bottom > size[1]):
+            raise BadRequest("face_box is outside the frame")
+    return (top, right, bottom, left)
+
+def frame_client_id(data):
+    # Kiosks can name themselves; otherwise frames are grouped by address
+    return data.get('client_id') or request.headers.get("X-Client-Id") or request.remote_addr
+
+def encode_faces(image_bytes, endpoint, face_box=None, client=None):
+    face_box = parse_face_box(face_box, image_bytes)
+    result = fingerprint = None
+    if client is not None and frame_cache.enabled:
+        with timed("frame_hash"):
+            fingerprint = frame_hash(image_bytes)
+            result = frame_cache.get(client, image_bytes, fingerprint, face_box)
+        FRAME_CACHE_LOOKUPS.inc("hit" if result else "miss")
+
+    if result is None:
+        options = dict(FACE_OPTIONS[endpoint], face_box=face_box)
+        try:
+            with timed("face_pool"):
+                result = face_pool.encode_faces(image_bytes, options)
+        except PoolRestarting:
+            raise
+        except PoolSaturated:
+            POOL_SATURATED.inc(request.endpoint)
+            raise
+        g.queue_wait_ms = round(result["queue_wait"] * 1000, 1)
+        record_stage("queue_wait", result["queue_wait"])
+        for stage, seconds in result["timings"].items():
+            record_stage(stage, seconds)
+        if fingerprint is not None:
+            frame_cache.put(client, image_bytes, fingerprint, result, face_box)
+    if result["rejected"]:
+        FRAMES_REJECTED.inc(request.endpoint, result["rejected"])
+        raise FrameRejected(result["rejected"], result["quality"])
+    return result["encodings"]
+
+def rejected_response(e):
+    response = jsonify({"status": "fail", "message": str(e), "reason": e.reason, "quality": e.metrics})
+    response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
+    return response, 422
+
+def http_error_response(e):
+    # Bad client input (an unreadable face_box or body, an upload over
+    # MAX_UPLOAD_BYTES or IMPORT_MAX_BYTES) keeps its 4xx status instead of becoming a 500
+    response = jsonify({"status": "fail", "message": e.description})
+    response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
+    return response, e.code
+
+def busy_response(e):
+    response = jsonify({"status": "fail", "message": str(e)})
+    response.headers["Retry-After"] = str(e.retry_after)
+    response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
+    return response, 503
+
+@app.after_request
+def add_queue_wait_header(response):
+    if "queue_wait_ms" in g:
+        response.headers["X-Queue-Wait-Ms"] = str(g.queue_wait_ms)
+    return response
+
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", 1024))
+
+def accepts_gzip():
+    return "gzip" in request.headers.get("Accept-Encoding", "")
+
+@app.after_request
+def compress_response(response):
+    if (response.is_streamed or response.status_code != 200 or not response.is_json
+            or "Content-Encoding" in response.headers or not accepts_gzip()):
+        return response
+    body = response.get_data()
+    if len(body) >= GZIP_MIN_BYTES:
+        response.set_data(gzip.compress(body, compresslevel=5))
+        response.headers["Content-Encoding"] = "gzip"
+        response.vary.add("Accept-Encoding")
+    return response
+
+def decrypt_encoding(encoding_encrypted):
+    with timed("fernet_decrypt"):
+        return codec.decode(encoding_encrypted)
 
 def generate_digital_id():
     return f"BIL-{random.randint(1000, 9999)}"
 
 def save_to_airtable(fields, log_table=False):
     table = AIRTABLE_LOGS_TABLE_NAME if log_table else AIRTABLE_TABLE_NAME
-    url = f"https://api.airtable.com/v0/{AIRTABLE_BASE_ID}/{table}"
-    headers = {
-        "Authorization": f"Bearer {AIRTABLE_PAT}",
-        "Content-Type": "application/json"
-    }
-    data = {"fields": fields}
-    res = requests.post(url, headers=headers, json=data)
+    res = airtable.post(table, {"fields": fields})
     print("📥 Airtable Response:", res.status_code, res.text)
     return res.json()
 
 
+# Local SQLite replica that serves the read endpoints once it has synced
+mirror = AirtableMirror(
+    os.getenv("MIRROR_PATH", "mirror.sqlite3"),
+    airtable,
+    {"users": AIRTABLE_TABLE_NAME, "logs": AIRTABLE_LOGS_TABLE_NAME},
+    interval=int(os.getenv("MIRROR_SYNC_SECONDS", 30)),
+    full_interval=int(os.getenv("MIRROR_FULL_SYNC_SECONDS", 900)),
+)
+
+# Bumped on every local write so listings can answer If-None-Match without Airtable
+table_versions = defaultdict(int)
+
+def bump_table_version(table):
+    table_versions[table] += 1
+
+def on_logs_written(table, records):
+    bump_table_version(table)
+    mirror.upsert("logs", records)
+
+# Log rows are written behind the response by a background writer
+def send_log_batch(table, records, upsert_on):
+    return airtable.rate_limited(airtable.create_records, table, records, upsert_on)
+
+airtable_outbox = AirtableOutbox(
+    os.getenv("OUTBOX_PATH", "outbox.sqlite3"),
+    send_log_batch,
+    dedup_field=os.getenv("OUTBOX_DEDUP_FIELD") or None,
+    on_sent=on_logs_written,
+)
+
+# Email lookups and today's check-ins, so repeat scans skip Airtable entirely
+scan_cache = ScanCache(ttl=int(os.getenv("SCAN_CACHE_TTL", 300)))
+
+def load_rollup_sources():
+    if mirror.ready:
+        return mirror.count("users"), mirror.query("logs", order_desc=None)
+    users, logs = airtable.fan_out(
+        lambda: airtable.list_all(AIRTABLE_TABLE_NAME, {"fields[]": ["DigitalID"]}),
+        lambda: airtable.list_all(AIRTABLE_LOGS_TABLE_NAME, {"fields[]": ["user_id", "event", "timestamp"]}),
+    )
+    return len(users), logs
+
+def rollup_changes(cursor):
+    # Every worker's delivered logs land in the shared mirror file
+    cursor, logs = mirror.changed_since("logs", cursor)
+    return cursor, logs, mirror.count("users") if mirror.ready else None
+
+# Dashboard aggregates, backfilled once and then updated on every log write
+rollups = AttendanceRollups(
+    load_rollup_sources,
+    refresh_interval=int(os.getenv("ROLLUP_REFRESH_SECONDS", 600)),
+    changes=rollup_changes,
+)
+
+def queue_log(fields):
+    with timed("log_write"):
+        airtable_outbox.enqueue(AIRTABLE_LOGS_TABLE_NAME, fields)
+    bump_table_version(AIRTABLE_LOGS_TABLE_NAME)
+    scan_cache.mark_checked_in(fields)
+    rollups.apply_log(fields)
+
 def get_existing_users():
-    url = f"https://api.airtable.com/v0/{AIRTABLE_BASE_ID}/{AIRTABLE_TABLE_NAME}"
-    headers = {"Authorization": f"Bearer {AIRTABLE_PAT}"}
-    users = []
-
-    offset = None
-    while True:
-        params = {"pageSize": 100}
-        if offset:
-            params["offset"] = offset
-        res = requests.get(url, headers=headers, params=params)
-        data = res.json()
-        for record in data.get("records", []):
-            encoding_encrypted = record["fields"].get("FaceEncoding")
-            if encoding_encrypted:
-                try:
-                    encoding_bytes = cipher.decrypt(encoding_encrypted.encode())
-                    encoding = np.frombuffer(encoding_bytes, dtype=np.float64)
-                    users.append((record["id"], encoding))
-                except Exception as e:
-                    print("⚠️ Skipping invalid encoding:", e)
-
-        offset = data.get("offset")
-        if not offset:
-            break
-    return users  
-    
+    records = [
+        record for record in airtable.list_all(AIRTABLE_TABLE_NAME, {"fields[]": ["FaceEncoding"]})
+        if record["fields"].get("FaceEncoding")
+    ]
+    with timed("fernet_decrypt_batch"):
+        matrix, ok = codec.decode_many([record["fields"]["FaceEncoding"] for record in records])
+    return [(record["id"], matrix[row]) for row, record in enumerate(records) if ok[row]]
+
+face_store = EncodingSnapshot(
+    os.getenv("FACE_SNAPSHOT_PATH", "face_index.snap"),
+    codec.fernet,
+    codec.primary_key,
+    compact_bytes=int(os.getenv("FACE_SNAPSHOT_COMPACT_BYTES", 1024 * 1024)),
+    # Rebuilt from Airtable this often so records changed there are seen
+    max_age=int(os.getenv("FACE_SNAPSHOT_MAX_AGE", 3600)),
+)
+face_index = FaceIndex(loader=get_existing_users, store=face_store)
+
+def registered_emails():
+    if mirror.ready:
+        records = mirror.query("users", order_desc=None)
+    else:
+        records = airtable.list_all(AIRTABLE_TABLE_NAME, {"fields[]": ["Email"]})
+    return {record["fields"]["Email"].strip().lower(): record["id"] for record in records if record["fields"].get("Email")}
+
+def on_bulk_created(records, encodings):
+    # Same bookkeeping /register does, once per accepted batch
+    for record in records:
+        scan_cache.put_user(record)
+        rollups.user_added()
+        queue_log({
+            "user_id": record["id"],
+            "venue": "Bulk Import",
+            "event": "User Registration",
+            "title": "New user registration",
+            "timestamp": str(datetime.datetime.now(datetime.timezone.utc).isoformat().replace("+00:00", "Z")),
+            "confidence_score": "100",
+        })
+    bump_table_version(AIRTABLE_TABLE_NAME)
+    mirror.upsert("users", records)
+
+def make_bulk_importer(workers=None):
+    return BulkImporter(
+        airtable,
+        AIRTABLE_TABLE_NAME,
+        codec,
+        face_index,
+        FACE_OPTIONS["register"],
+        MATCH_TOLERANCE,
+        registered_emails(),
+        generate_digital_id,
+        workers=workers,
+        on_created=on_bulk_created,
+    )
+
 
 # Register endpoint
 @app.route('/register', methods=['POST'])
 def register_user():
     try:
-        data = request.get_json()
-        image_np = decode_base64_image(data['image'])
-        encodings = face_recognition.face_encodings(image_np)
+        data, image_bytes = read_frame_request()
+        if not image_bytes:
+            return jsonify({"status": "fail", "message": "Image is required"}), 400
+        encodings = encode_faces(image_bytes, "register", data.get('face_box'))
 
         if not encodings:
             return jsonify({"status": "fail", "message": "No face detected"}), 400
 
         # Check if face already registered
-        # existing_users = get_existing_users()  # should return list of (user_id, decrypted_encoding)
-        # for user_id, stored_encoding in existing_users:
-        #     match = face_recognition.compare_faces([stored_encoding], encodings[0], tolerance=0.45)[0]
-        #     if match:
-        #         return jsonify({
-        #             "status": "fail",
-        #             "message": "Face already registered",
-        #             "user_id": user_id
-        #         }), 409
-
-        encrypted_encoding = cipher.encrypt(encodings[0].tobytes()).decode()
+        face_index.ensure_loaded()
+        with timed("match"):
+            duplicates = face_index.query(encodings[0], k=1, tolerance=MATCH_TOLERANCE)
+        if duplicates:
+            return jsonify({
+                "status": "fail",
+                "message": "Face already registered",
+                "user_id": duplicates[0][0]
+            }), 409
+
+        with timed("fernet_encrypt"):
+            encrypted_encoding = codec.encode(encodings[0])
         digital_id = generate_digital_id()
 
         fields = {
@@ -127,7 +470,13 @@ def register_user():
             "Timestamp": str(datetime.datetime.now(datetime.timezone.utc).isoformat().replace("+00:00", "Z"))
         }
 
-        response = save_to_airtable(fields)
+        with timed("airtable_create"):
+            response = save_to_airtable(fields)
+        face_index.upsert(response['id'], encodings[0])
+        scan_cache.put_user(response)
+        rollups.user_added()
+        bump_table_version(AIRTABLE_TABLE_NAME)
+        mirror.upsert("users", [response])
 
         log_fields = {
             "user_id": response['id'],
@@ -138,13 +487,96 @@ def register_user():
             "confidence_score": "100",
         }
 
-        save_to_airtable(log_fields, log_table=True)
+        queue_log(log_fields)
         return jsonify({"status": "success", "digital_id": digital_id, "airtable_response": response})
 
+    except PoolSaturated as e:
+        return busy_response(e)
+    except FrameRejected as e:
+        return rejected_response(e)
+    except HTTPException as e:
+        return http_error_response(e)
     except Exception as e:
         print("❌ Registration error:", e)
         return jsonify({"status": "fail", "message": str(e)}), 500
 
+def load_days_logs(event, today_start, today_end):
+    log_query = {"filterByFormula": f"AND("f"{{event}} = '{event}',"f"IS_AFTER({{timestamp}}, '{today_start}'),"f"IS_BEFORE({{timestamp}}, '{today_end}')"f")"}
+    return airtable.list_all(AIRTABLE_LOGS_TABLE_NAME, log_query)
+
+def shared_checkin(user_id, event):
+    """Today's check-in for ``user_id`` recorded by any worker: still queued
+    in the shared outbox, or delivered and written to the shared mirror."""
+    day_start, day_end = (datetime.datetime.fromisoformat(bound.replace("Z", "+00:00")) for bound in scan_cache.day_bounds())
+    queued = airtable_outbox.find(AIRTABLE_LOGS_TABLE_NAME, since=day_start.timestamp(), user_id=user_id, event=event)
+    if queued:
+        return queued[0]
+    for record in mirror.query("logs", equals={"user_id": user_id, "event": event}):
+        try:
+            logged_at = datetime.datetime.fromisoformat(record["fields"].get("timestamp", "").replace("Z", "+00:00"))
+            if day_start <= logged_at <= day_end:
+                return record["fields"]
+        except (ValueError, TypeError):
+            continue
+    return None
+
+def find_todays_log(user_id, event):
+    with timed("checkin_lookup"):
+        found = scan_cache.checked_in(event, user_id, load_days_logs)
+        if found is None:
+            # Another worker may have checked them in since the day was cached
+            found = shared_checkin(user_id, event)
+            if found is not None:
+                scan_cache.mark_checked_in(found)
+        return found
+
+def find_user_by_email(email):
+    record = scan_cache.get_user(email=email)
+    if record is None:
+        with timed("user_lookup"):
+            records = airtable.list(AIRTABLE_TABLE_NAME, {"filterByFormula": f"{{email}} = '{email}'"}).get('records', [])
+        if not records:
+            return None
+        record = records[0]
+        scan_cache.put_user(record)
+    return record
+
+def find_user_by_id(record_id):
+    """The user's record, or None when Airtable no longer has it."""
+    record = scan_cache.get_user(record_id=record_id)
+    if record is None:
+        with timed("user_lookup"):
+            res = airtable.get(AIRTABLE_TABLE_NAME, record_id)
+        if res.status_code == 404:
+            return None
+        res.raise_for_status()
+        record = res.json()
+        scan_cache.put_user(record)
+    return record
+
+def already_checked_in_response(log_fields):
+    return jsonify({"status": "success", "message": "You have already checked in today", "match": True, "user_id": log_fields.get("user_id"), "event": log_fields.get("event"), "confidence": log_fields.get("confidence_score")}), 200
+
+def record_attendance(user_id, user_name, data, confidence):
+    log_fields = {
+        "user_id": user_id,
+        "venue": data.get('venue', 'Unknown Venue'),
+        "event": data.get('event', 'Tech Conference'),
+        "title": f"User ({user_name}) Have Scan Attendance To Event ({data.get('event', 'Tech Conference')})",
+        "timestamp": str(datetime.datetime.now(datetime.timezone.utc).isoformat().replace("+00:00", "Z")),
+        "confidence_score": f"{round(confidence, 3)}",
+    }
+
+    queue_log(log_fields)
+    response = jsonify({"status": "success", "match": True, "user_id": log_fields["user_id"], "confidence": confidence})
+    response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
+    return response
+
+def no_match_response():
+    response = jsonify({"status": "fail", "match": False, "message": "No match found"})
+    response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
+    return response, 404
+
 # Face scanner endpoint
 @app.route('/facescanner', methods=['POST', 'OPTIONS'])
 def scan_face():
@@ -156,85 +588,79 @@ def scan_face():
         return response, 200
 
     try:
-        data = request.get_json()
-
-        if not data or 'email' not in data:
-            return jsonify({"status": "fail", "message": "Email is required"}), 400
+        data, incoming_image_bytes = read_frame_request()
 
         if not data or 'event' not in data:
             return jsonify({"status": "fail", "message": "Event is required"}), 400
 
-        incoming_email = data['email'].strip().lower()
-        incoming_image = decode_base64_image(data['image'])
+        if not incoming_image_bytes:
+            return jsonify({"status": "fail", "message": "Image is required"}), 400
 
-        url = f"https://api.airtable.com/v0/{AIRTABLE_BASE_ID}/{AIRTABLE_TABLE_NAME}"
-        headers = {"Authorization": f"Bearer {AIRTABLE_PAT}"}
-        records = requests.get(url, headers=headers, params={"filterByFormula": f"{{email}} = '{incoming_email}'"}).json().get('records', [])
+        # Without an email the scan becomes a 1:N identification against the face index
+        if not data.get('email'):
+            face_index.ensure_loaded()
+            unknown_encoding = encode_faces(incoming_image_bytes, "scan", data.get('face_box'), frame_client_id(data))[0]
+            print(f"🔍 Identifying against {len(face_index)} users")
+            with timed("match"):
+                matches = face_index.query(unknown_encoding, k=1, tolerance=MATCH_TOLERANCE)
+            if not matches:
+                return no_match_response()
 
-        if not records:
-            return jsonify({"status": "fail", "message": "Email not registered"}), 404
+            user_id, distance = matches[0]
+            already_logged = find_todays_log(user_id, data.get('event', 'BIL Workshop Room'))
+            if already_logged:
+                return already_checked_in_response(already_logged)
 
-        user_id = records[0]['id']
+            user_res = find_user_by_id(user_id)
+            if user_res is None:
+                # Deleted straight in Airtable since the index was built
+                face_index.remove(user_id)
+                return no_match_response()
+            return record_attendance(user_id, user_res.get('fields', {}).get('Name'), data, 1 - distance)
 
-        jakarta_tz = pytz.timezone("Asia/Jakarta")
-        now_jakarta = datetime.datetime.now(jakarta_tz)
-        today_start = now_jakarta.replace(hour=0, minute=0, second=0, microsecond=0).astimezone(pytz.utc).isoformat().replace("+00:00", "Z")
-        today_end = now_jakarta.replace(hour=23, minute=59, second=59, microsecond=999999).astimezone(pytz.utc).isoformat().replace("+00:00", "Z")
+        incoming_email = data['email'].strip().lower()
+        user_record = find_user_by_email(incoming_email)
 
-        log_table_url = f"https://api.airtable.com/v0/{AIRTABLE_BASE_ID}/{AIRTABLE_LOGS_TABLE_NAME}"
-        log_query = {"filterByFormula": f"AND("f"{{user_id}} = '{user_id}',"f"{{event}} = '{data.get('event', 'BIL Workshop Room')}',"f"IS_AFTER({{timestamp}}, '{today_start}'),"f"IS_BEFORE({{timestamp}}, '{today_end}')"f")"}
-        log_res = requests.get(log_table_url, headers=headers, params=log_query).json()
-        already_logged = log_res.get("records", [])
+        if not user_record:
+            return jsonify({"status": "fail", "message": "Email not registered"}), 404
+        records = [user_record]
 
+        user_id = records[0]['id']
+
+        already_logged = find_todays_log(user_id, data.get('event', 'BIL Workshop Room'))
         if already_logged:
-            return jsonify({"status": "success", "message": "You have already checked in today", "match": True, "user_id": already_logged[0]["fields"].get("user_id"), "event": already_logged[0]["fields"].get("event"), "confidence": already_logged[0]["fields"].get("confidence_score")}), 200
+            return already_checked_in_response(already_logged)
 
         print(f"🔍 Comparing against {len(records)} users")
-        unknown_encoding = face_recognition.face_encodings(incoming_image)[0]
+        unknown_encoding = encode_faces(incoming_image_bytes, "scan", data.get('face_box'), frame_client_id(data))[0]
+        # Replays other workers' updates and deletes before comparing
+        face_index.ensure_loaded()
 
         for record in records:
-            encrypted = record['fields'].get('FaceEncoding')
-            if not encrypted:
-                continue
-
-            decrypted_bytes = cipher.decrypt(encrypted.encode())
-            known_encoding = np.frombuffer(decrypted_bytes, dtype=np.float64)
-
-            match_result = face_recognition.compare_faces([known_encoding], unknown_encoding, tolerance=0.45)[0]
-            if match_result:
-                confidence = 1 - face_recognition.face_distance([known_encoding], unknown_encoding)[0]
-
-                log_fields = {
-                    "user_id": record['id'],
-                    "venue": data.get('venue', 'Unknown Venue'),
-                    "event": data.get('event', 'Tech Conference'),
-                    "title": f"User ({record['fields'].get('Name')}) Have Scan Attendance To Event ({data.get('event', 'Tech Conference')})",
-                    "timestamp": str(datetime.datetime.now(datetime.timezone.utc).isoformat().replace("+00:00", "Z")),
-                    "confidence_score": f"{round(confidence, 3)}",
-                }
-
-                save_to_airtable(log_fields, log_table=True)
-                response = jsonify({"status": "success", "match": True, "user_id": log_fields["user_id"], "confidence": confidence})
-                response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-                return response
-
-        response = jsonify({"status": "fail", "match": False, "message": "No match found"})
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        return response, 404
+            distance = face_index.distance_to(record['id'], unknown_encoding)
+            if distance is None:
+                encrypted = record['fields'].get('FaceEncoding')
+                if not encrypted:
+                    continue
+                distance = np.linalg.norm(decrypt_encoding(encrypted) - unknown_encoding)
+
+            if distance <= MATCH_TOLERANCE:
+                return record_attendance(record['id'], record['fields'].get('Name'), data, 1 - distance)
 
+        return no_match_response()
+
+    except PoolSaturated as e:
+        return busy_response(e)
+    except FrameRejected as e:
+        return rejected_response(e)
+    except HTTPException as e:
+        return http_error_response(e)
     except Exception as e:
         print("❌ Scan error:", e)
         response = jsonify({"status": "fail", "message": str(e)})
         response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
         return response, 500
 
-headers = {
-    "Authorization": f"Bearer {AIRTABLE_PAT}",
-    "Content-Type": "application/json",
-}
-user_table_url = f"https://api.airtable.com/v0/{AIRTABLE_BASE_ID}/{AIRTABLE_TABLE_NAME}"
-log_table_url = f"https://api.airtable.com/v0/{AIRTABLE_BASE_ID}/{AIRTABLE_LOGS_TABLE_NAME}"
-
 @app.route("/dashboard", methods=["GET"])
 def get_dashboard():
     try:
@@ -244,104 +670,154 @@ def get_dashboard():
     except:
         day_param = 14
     event_param = request.args.get("event", default="Tech Conference", type=str)
-    jakarta_tz = pytz.timezone("Asia/Jakarta")
-    today = datetime.datetime.now(jakarta_tz).date()
-    today_start = today.isoformat() + "T00:00:00.000Z"
-    today_end = today.isoformat() + "T23:59:59.999Z"
-    user_res = requests.get(user_table_url, headers=headers).json()
-    user = user_res.get("records", [])
-    total_user = len(user)
-    log_query = {"filterByFormula": f"AND(IS_AFTER({{timestamp}}, '{today_start}'), IS_BEFORE({{timestamp}}, '{today_end}'), {{event}} = '{event_param}')"}
-    log_res = requests.get(log_table_url, headers=headers, params=log_query).json()
-    log = log_res.get("records", [])
-    user_attended = set()
-    user_late = set()
-    tolerance_start = datetime.time(7, 45)
-    tolerance_end = datetime.time(8, 15)
-    for single_log in log:
-        field = single_log.get("fields", {})
-        user_id = field.get("user_id")
-        timestamp = field.get("timestamp")
-        if user_id and timestamp:
-            try:
-                dt = datetime.datetime.fromisoformat(timestamp.replace("Z", "+00:00")).astimezone(jakarta_tz)
-                attendance_time = dt.time()
-                if tolerance_start <= attendance_time <= tolerance_end:
-                    user_attended.add(user_id)
-                else:
-                    user_late.add(user_id)
-            except:
-                continue
-    total_attendance = len(user_attended)
-    total_late = len(user_late)
-    total_absence = total_user - total_attendance - total_late
-    log_latest_query = {"sort[0][field]": "timestamp", "sort[0][direction]": "desc", "pageSize": 10}
-    latest_log_res = requests.get(log_table_url, headers=headers, params=log_latest_query).json()
-    latest_log = latest_log_res.get("records", [])
-    log_all_res = requests.get(log_table_url, headers=headers, params={"filterByFormula": f"AND({{event}} = '{event_param}')"}).json()
-    log_all = log_all_res.get("records", [])
-    attendance_per_day = defaultdict(set)
-    attendance_per_hour = defaultdict(lambda: defaultdict(int))
-    for single_log in log_all:
-        field = single_log.get("fields", {})
-        timestamp = field.get("timestamp")
-        user_id = field.get("user_id")
-        if timestamp and user_id:
-            try:
-                dt = datetime.datetime.fromisoformat(timestamp.replace("Z", "+00:00")).astimezone(jakarta_tz)
-                date_only = dt.date().isoformat() # date_only = timestamp[:10]
-                hour = dt.hour
-                attendance_per_day[date_only].add(user_id)
-                attendance_per_hour[date_only][hour] += 1
-            except Exception as e:
-                continue
-    daily_attendance = [{"date": date, "count": len(user_id)} for date, user_id in sorted(attendance_per_day.items(), reverse=True)]
-    attendance_heatmap = []
-    if day_param == 0:
-        for date_key, hour_value in sorted(attendance_per_hour.items(), reverse=True):
-            for hour_key, count_value in sorted(hour_value.items()):
-                attendance_heatmap.append({
-                    "date": date_key,
-                    "hour": hour_key,
-                    "count": count_value,
-                })
-    else:
-        date_range = [(today - datetime.timedelta(days=i)).isoformat() for i in range(day_param)][::-1]
-        for date_str in date_range:
-            for hour in range(24):
-                count = attendance_per_hour[date_str][hour] if hour in attendance_per_hour.get(date_str, {}) else 0
-                attendance_heatmap.append({
-                    "date": date_str,
-                    "hour": hour,
-                    "count": count,
-                })
+    with timed("rollups_refresh"):
+        rollups.ensure_fresh()
+    with timed("latest_logs"):
+        if mirror.ready:
+            latest_log = mirror.query("logs", limit=10)
+        else:
+            log_latest_query = {"sort[0][field]": "timestamp", "sort[0][direction]": "desc", "pageSize": 10}
+            latest_log = airtable.list(AIRTABLE_LOGS_TABLE_NAME, log_latest_query).get("records", [])
+    with timed("rollups_summary"):
+        summary = rollups.summary(event_param, day_param)
     return jsonify(
         {
             "status": "success",
             "data": {
-                "total_user": total_user,
-                "total_attendance_today": total_attendance,
-                "total_late_today": total_late,
-                "total_absence_today": total_absence,
+                "total_user": summary["total_user"],
+                "total_attendance_today": summary["total_attendance_today"],
+                "total_late_today": summary["total_late_today"],
+                "total_absence_today": summary["total_absence_today"],
                 "latest_log": latest_log,
-                "daily_attendance": daily_attendance,
-                "hourly_attendance": attendance_heatmap,
+                "daily_attendance": summary["daily_attendance"],
+                "hourly_attendance": summary["hourly_attendance"],
             },
         },
     )
 
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# Query args that drive the listing itself rather than filter on a field
+LISTING_PARAMS = ("search", "page_size", "cursor", "format")
+LISTING_ETAG_TTL = int(os.getenv("LISTING_ETAG_TTL", 30))
+
+def listing_etag(table, version=None):
+    if version is None:
+        # Edits made straight in Airtable are not counted, so tags also expire
+        version = f"{table_versions[table]}:{int(time.time() // LISTING_ETAG_TTL)}"
+    args = "&".join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+    return hashlib.sha1(f"{table}:{version}:{args}".encode()).hexdigest()
+
+def not_modified(etag):
+    response = make_response("", 304)
+    response.set_etag(etag)
+    return response
+
+def ndjson_response(chunks):
+    def compressed():
+        compressor = zlib.compressobj(5, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode())
+            if data:
+                yield data
+        yield compressor.flush()
+
+    if accepts_gzip():
+        response = Response(stream_with_context(compressed()), mimetype="application/x-ndjson")
+        response.headers["Content-Encoding"] = "gzip"
+        response.vary.add("Accept-Encoding")
+        return response
+    return Response(stream_with_context(chunks), mimetype="application/x-ndjson")
+
+def stream_records(table, query):
+    def generate():
+        params = dict(query, pageSize=100)
+        while True:
+            data = airtable.list(table, params)
+            for record in data.get("records", []):
+                yield json.dumps(record) + "\n"
+            if not data.get("offset"):
+                return
+            params["offset"] = data["offset"]
+
+    return ndjson_response(generate())
+
+def list_response(table, query):
+    """One page of ``table`` (or the whole table as NDJSON) with ETag support."""
+    etag = listing_etag(table)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    if request.args.get("format") == "ndjson":
+        response = stream_records(table, query)
+    else:
+        query["pageSize"] = max(1, min(request.args.get("page_size", default=100, type=int), 100))
+        if request.args.get("cursor"):
+            query["offset"] = request.args["cursor"]
+        try:
+            res = airtable.list(table, query)
+        except AirtableError as e:
+            if e.status_code != 422:
+                raise
+            return jsonify({"status": "fail", "message": "Invalid cursor or filter", "error": e.error}), 400
+        response = jsonify({"status": "success", "data": res.get("records", []), "next_cursor": res.get("offset")})
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def mirror_list_response(kind, search_fields):
+    """Same contract as ``list_response`` but answered from the SQLite mirror;
+    cursors are plain row offsets."""
+    etag = listing_etag(kind, mirror.version())
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    filters = {key: value for key, value in request.args.items() if key not in LISTING_PARAMS}
+    search_value = request.args.get("search")
+
+    def query(limit, offset):
+        return mirror.query(kind, equals=filters, search=search_value, search_fields=search_fields, limit=limit, offset=offset)
+
+    if request.args.get("format") == "ndjson":
+        def generate():
+            offset = 0
+            while True:
+                records = query(500, offset)
+                for record in records:
+                    yield json.dumps(record) + "\n"
+                if len(records) < 500:
+                    return
+                offset += len(records)
+        response = ndjson_response(generate())
+    else:
+        page_size = max(1, min(request.args.get("page_size", default=100, type=int), 100))
+        try:
+            offset = int(request.args.get("cursor") or 0)
+        except ValueError:
+            return jsonify({"status": "fail", "message": "Invalid cursor"}), 400
+        records = query(page_size + 1, offset)
+        next_cursor = str(offset + page_size) if len(records) > page_size else None
+        response = jsonify({"status": "success", "data": records[:page_size], "next_cursor": next_cursor})
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+USER_SEARCH_FIELDS = ["Name", "Email", "Phone", "DigitalID"]
+LOG_SEARCH_FIELDS = ["user_id", "vanue", "confidence_score"]
+
 @app.route("/users", methods=["GET"])
 def get_all_user():
+    if mirror.ready:
+        return mirror_list_response("users", USER_SEARCH_FIELDS)
     params = []
     search_value = request.args.get("search")
     for key, value in request.args.items():
-        if key != "search":
+        if key not in LISTING_PARAMS:
             formula = f"{{{key}}}='{value}'"
             params.append(formula)
     search_formula = ""
     if search_value:
-        searchable_fields = ["Name", "Email", "Phone", "DigitalID"]
-        or_conditions = [f"FIND(LOWER('{search_value}'), LOWER({{{field}}}))" for field in searchable_fields]
+        or_conditions = [f"FIND(LOWER('{search_value}'), LOWER({{{field}}}))" for field in USER_SEARCH_FIELDS]
         search_formula = "OR(" + ",".join(or_conditions) + ")"
     all_conditions = []
     if params:
@@ -353,12 +829,17 @@ def get_all_user():
         query["filterByFormula"] = "AND(" + ",".join(all_conditions) + ")" if len(all_conditions) > 1 else all_conditions[0]
     query["sort[0][field]"] = "Timestamp"
     query["sort[0][direction]"] = "desc"
-    res = requests.get(user_table_url, headers=headers, params=query).json()
-    return jsonify({"status": "success", "data": res.get("records", [])})
+    return list_response(AIRTABLE_TABLE_NAME, query)
 
 @app.route("/users/<record_id>", methods=["GET"])
 def get_single_user(record_id):
-    res = requests.get(f"{user_table_url}/{record_id}", headers=headers)
+    if mirror.ready:
+        user = mirror.get("users", record_id)
+        if user is None:
+            return jsonify({"status": "fail", "message": "Data not found"}), 404
+        user["log"] = mirror.query("logs", equals={"user_id": record_id})
+        return jsonify({"status": "success", "data": user})
+    res = airtable.get(AIRTABLE_TABLE_NAME, record_id)
     if res.status_code == 404:
         return jsonify({"status": "fail", "message": "Data not found"}), 404
     user = res.json()
@@ -367,42 +848,55 @@ def get_single_user(record_id):
         "sort[0][field]": "timestamp",
         "sort[0][direction]": "desc",
     }
-    log_res = requests.get(log_table_url, headers=headers, params=log_query).json()
-    log = log_res.get("records", [])
+    log = airtable.list(AIRTABLE_LOGS_TABLE_NAME, log_query).get("records", [])
     user["log"] = log
     return jsonify({"status": "success", "data": user})
 
 @app.route("/users/<record_id>", methods=["PUT"])
 def update_user(record_id):
-    res = requests.put(f"{user_table_url}/{record_id}", json={"fields": request.json}, headers=headers)
+    res = airtable.put(AIRTABLE_TABLE_NAME, record_id, request.json)
     if res.status_code == 404:
         return jsonify({"status": "fail", "message": "Data not found"}), 404
+    scan_cache.put_user(res.json())
+    bump_table_version(AIRTABLE_TABLE_NAME)
+    mirror.upsert("users", [res.json()])
+    encoding_encrypted = res.json().get("fields", {}).get("FaceEncoding")
+    if encoding_encrypted:
+        face_index.upsert(record_id, decrypt_encoding(encoding_encrypted))
+    else:
+        face_index.remove(record_id)
     return jsonify({"status": "success", "data": res.json()})
 
 @app.route("/users/<record_id>", methods=["DELETE"])
 def delete_user(record_id):
-    get_res = requests.get(f"{user_table_url}/{record_id}", headers=headers)
+    get_res = airtable.get(AIRTABLE_TABLE_NAME, record_id)
     if get_res.status_code == 404:
         return jsonify({"status": "fail", "message": "Data not found"}), 404
     record_data = get_res.json()
-    del_res = requests.delete(f"{user_table_url}/{record_id}", headers=headers)
+    del_res = airtable.delete(AIRTABLE_TABLE_NAME, record_id)
     if del_res.status_code == 200:
+        face_index.remove(record_id)
+        scan_cache.invalidate_user(record_id)
+        rollups.user_removed()
+        bump_table_version(AIRTABLE_TABLE_NAME)
+        mirror.delete("users", record_id)
         return jsonify({"status": "success", "data": record_data})
     else:
         return jsonify({"status": "fail", "message": "Failed to delete data"}), del_res.status_code
 
 @app.route("/logs", methods=["GET"])
 def get_all_log():
+    if mirror.ready:
+        return mirror_list_response("logs", LOG_SEARCH_FIELDS)
     params = []
     search_value = request.args.get("search")
     for key, value in request.args.items():
-        if key != "search":
+        if key not in LISTING_PARAMS:
             formula = f"{{{key}}}='{value}'"
             params.append(formula)
     search_formula = ""
     if search_value:
-        searchable_fields = ["user_id", "vanue", "confidence_score"]
-        or_conditions = [f"FIND(LOWER('{search_value}'), LOWER({{{field}}}))" for field in searchable_fields]
+        or_conditions = [f"FIND(LOWER('{search_value}'), LOWER({{{field}}}))" for field in LOG_SEARCH_FIELDS]
         search_formula = "OR(" + ",".join(or_conditions) + ")"
     all_conditions = []
     if params:
@@ -414,37 +908,213 @@ def get_all_log():
         query["filterByFormula"] = "AND(" + ",".join(all_conditions) + ")" if len(all_conditions) > 1 else all_conditions[0]
     query["sort[0][field]"] = "timestamp"
     query["sort[0][direction]"] = "desc"
-    res = requests.get(log_table_url, headers=headers, params=query).json()
-    return jsonify({"status": "success", "data": res.get("records", [])})
+    return list_response(AIRTABLE_LOGS_TABLE_NAME, query)
 
 @app.route("/logs/<record_id>", methods=["GET"])
 def get_single_log(record_id):
-    res = requests.get(f"{log_table_url}/{record_id}", headers=headers)
+    if mirror.ready:
+        log = mirror.get("logs", record_id)
+        if log is None:
+            return jsonify({"status": "fail", "message": "Data not found"}), 404
+        return jsonify({"status": "success", "data": log})
+    res = airtable.get(AIRTABLE_LOGS_TABLE_NAME, record_id)
     if res.status_code == 404:
         return jsonify({"status": "fail", "message": "Data not found"}), 404
     return jsonify({"status": "success", "data": res.json()})
 
 @app.route("/logs/<record_id>", methods=["PUT"])
 def update_log(record_id):
-    res = requests.put(f"{log_table_url}/{record_id}", json={"fields": request.json}, headers=headers)
+    res = airtable.put(AIRTABLE_LOGS_TABLE_NAME, record_id, request.json)
     if res.status_code == 404:
         return jsonify({"status": "fail", "message": "Data not found"}), 404
+    scan_cache.forget_checkins(res.json().get("fields", {}).get("user_id"))
+    rollups.invalidate()
+    bump_table_version(AIRTABLE_LOGS_TABLE_NAME)
+    mirror.upsert("logs", [res.json()])
     return jsonify({"status": "success", "data": res.json()})
 
 @app.route("/logs/<record_id>", methods=["DELETE"])
 def delete_log(record_id):
-    get_res = requests.get(f"{log_table_url}/{record_id}", headers=headers)
+    get_res = airtable.get(AIRTABLE_LOGS_TABLE_NAME, record_id)
     if get_res.status_code == 404:
         return jsonify({"status": "fail", "message": "Data not found"}), 404
     record_data = get_res.json()
-    del_res = requests.delete(f"{log_table_url}/{record_id}", headers=headers)
+    del_res = airtable.delete(AIRTABLE_LOGS_TABLE_NAME, record_id)
     if del_res.status_code == 200:
+        scan_cache.forget_checkins(record_data.get("fields", {}).get("user_id"))
+        rollups.discard_log(record_data.get("fields", {}))
+        bump_table_version(AIRTABLE_LOGS_TABLE_NAME)
+        mirror.delete("logs", record_id)
         return jsonify({"status": "success", "data": record_data})
     else:
         return jsonify({"status": "fail", "message": "Failed to delete data"}), del_res.status_code
 
+# Bulk imports run one at a time in a background thread; uploads and progress
+# live under IMPORT_DIR so a job can be inspected or resumed after a restart.
+# Workers share nothing but the directory, so file locks say what is running:
+# IMPORT_DIR/import.lock while any import runs, <job>/run.lock for that job
+IMPORT_DIR = os.getenv("IMPORT_DIR", "imports")
+BULK_IMPORT_WORKERS = int(os.getenv("BULK_IMPORT_WORKERS", os.cpu_count() or 1))
+# A whole event's photos arrive in one zip, so imports get their own cap
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", 1024 * 1024 * 1024))
+
+def try_lock(path):
+    """Open ``path`` holding an exclusive lock, or None if someone else holds it."""
+    lock = open(path, "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return None
+    return lock
+
+def import_job_dir(job_id):
+    return os.path.join(IMPORT_DIR, os.path.basename(job_id))
+
+def save_import_job(job_id, job):
+    path = os.path.join(import_job_dir(job_id), "job.json")
+    with open(f"{path}.tmp", "w") as f:
+        json.dump({key: job[key] for key in ("id", "state", "started", "finished", "error")}, f)
+    os.replace(f"{path}.tmp", path)
+
+def run_import_job(job_id, job, locks):
+    job_dir = import_job_dir(job_id)
+    try:
+        make_bulk_importer(workers=BULK_IMPORT_WORKERS).run(
+            os.path.join(job_dir, "attendees.csv"),
+            os.path.join(job_dir, "photos.zip"),
+            os.path.join(job_dir, "progress.jsonl"),
+            status=job,
+        )
+        job["state"] = "done"
+    except Exception as e:
+        print("❌ Bulk import error:", e)
+        job.update(state="failed", error=str(e))
+    finally:
+        job["finished"] = time.time()
+        save_import_job(job_id, job)
+        for lock in locks:
+            lock.close()
+
+def start_import_job(job_id):
+    running = try_lock(os.path.join(IMPORT_DIR, "import.lock"))
+    if running is None:
+        return None
+    job_lock = try_lock(os.path.join(import_job_dir(job_id), "run.lock"))
+    if job_lock is None:
+        running.close()
+        return None
+    job = {"id": job_id, "state": "running", "started": time.time(), "finished": None, "error": None}
+    save_import_job(job_id, job)
+    threading.Thread(target=run_import_job, args=(job_id, job, (job_lock, running)), name=f"bulk-import-{job_id}", daemon=True).start()
+    return job
+
+def load_import_job(job_id):
+    job_dir = import_job_dir(job_id)
+    if not os.path.exists(os.path.join(job_dir, "job.json")):
+        return None
+    with open(os.path.join(job_dir, "job.json")) as f:
+        job = json.load(f)
+    if job["state"] == "running":
+        lock = try_lock(os.path.join(job_dir, "run.lock"))
+        if lock is not None:
+            lock.close()
+            job["state"] = "interrupted"  # the process that ran it is gone
+    job["total"] = sum(1 for _ in read_rows(os.path.join(job_dir, "attendees.csv")))
+    job["counts"] = ImportProgress(os.path.join(job_dir, "progress.jsonl")).counts()
+    return job
+
+def import_job_response(job, status=200):
+    return jsonify({"status": "success", "data": job, "status_url": f"/users/import/{job['id']}"}), status
+
+@app.route("/users/import", methods=["POST"])
+def import_users():
+    request.max_content_length = IMPORT_MAX_BYTES
+    try:
+        csv_file = request.files.get("csv")
+        photos_file = request.files.get("photos")
+    except HTTPException as e:
+        return http_error_response(e)
+    if not csv_file or not photos_file:
+        return jsonify({"status": "fail", "message": "A csv file and a photos zip are required"}), 400
+    job_id = uuid.uuid4().hex[:12]
+    job_dir = import_job_dir(job_id)
+    os.makedirs(job_dir)
+    csv_file.save(os.path.join(job_dir, "attendees.csv"))
+    photos_file.save(os.path.join(job_dir, "photos.zip"))
+    if not zipfile.is_zipfile(os.path.join(job_dir, "photos.zip")):
+        return jsonify({"status": "fail", "message": "Photos must be uploaded as a zip file"}), 400
+    job = start_import_job(job_id)
+    if job is None:
+        return jsonify({"status": "fail", "message": "Another import is still running"}), 409
+    return import_job_response(job, 202)
+
+@app.route("/users/import/<job_id>", methods=["GET"])
+def get_import_job(job_id):
+    job = load_import_job(job_id)
+    if job is None:
+        return jsonify({"status": "fail", "message": "Import not found"}), 404
+    return import_job_response(job)
+
+@app.route("/users/import/<job_id>/resume", methods=["POST"])
+def resume_import_job(job_id):
+    job = load_import_job(job_id)
+    if job is None:
+        return jsonify({"status": "fail", "message": "Import not found"}), 404
+    if job["state"] in ("running", "done"):
+        return import_job_response(job)
+    job = start_import_job(job_id)
+    if job is None:
+        return jsonify({"status": "fail", "message": "Another import is still running"}), 409
+    return import_job_response(job, 202)
+
+# Startup is split so a preforking server can do the expensive, shareable part
+# once in the master (see wsgi.py) and the per-process part in each worker
+services_started = False
+
+def warm_up():
+    """Load what the first request would otherwise pay for: the face index,
+    the codec and, when faces are encoded in this process, the models."""
+    started = time.perf_counter()
+    face_index.ensure_loaded()
+    codec.decode(codec.encode(np.zeros(128)))
+    if FACE_POOL_WORKERS == 0:
+        face_pool.start()
+    print(f"🔥 Warm-up finished in {time.perf_counter() - started:.2f}s")
+
+def start_background_services(forked=False):
+    """Start this process's threads and pools; threads do not survive a fork."""
+    global services_started
+    if forked:
+        airtable.after_fork()
+    face_index.ensure_loaded()
+    face_pool.start()
+    airtable_outbox.start()
+    mirror.start()
+    services_started = True
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    return jsonify({"status": "ok"})
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    checks = {
+        "services": services_started,
+        "face_index": face_index.loaded,
+        "face_models": FACE_POOL_WORKERS > 0 or face_pipeline.face_recognition is not None,
+        "face_pool": face_pool.ready(),
+    }
+    ready = all(checks.values())
+    # The mirror only speeds reads up; until it has synced Airtable is used
+    checks["mirror"] = mirror.ready
+    return jsonify({"status": "ok" if ready else "fail", "checks": checks}), 200 if ready else 503
+
 # HTTPS for mobile testing
 if __name__ == "__main__":
+    warm_up()
+    start_background_services()
     app.run(
         host="0.0.0.0",
         port=6000,
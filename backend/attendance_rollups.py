@@ -0,0 +1,171 @@
+import datetime
+import threading
+import time
+from collections import defaultdict
+
+import pytz
+
+
+def _event_state():
+    return {
+        "days": defaultdict(set),
+        "hours": defaultdict(lambda: defaultdict(int)),
+        "on_time": defaultdict(set),
+        "late": defaultdict(set),
+    }
+
+
+class AttendanceRollups:
+    """Precomputed dashboard aggregates per event.
+
+    Holds, per event and Jakarta day, the set of unique attendees, per-hour
+    scan counts and the on-time/late classification, plus the total number
+    of registered users. It is backfilled once from every page of both
+    tables and then updated as logs are written, so ``summary`` only reads
+    the days it reports on.
+
+    Edits made in Airtable are folded in by a background re-backfill every
+    ``refresh_interval`` seconds; the previous numbers keep being served
+    meanwhile. Logs written by other workers are followed much sooner
+    through ``changes(cursor)``, which returns ``(cursor, log records,
+    total users or None)`` for everything written since ``cursor`` (and just
+    the current cursor when it is None).
+    """
+
+    def __init__(self, loader, timezone="Asia/Jakarta", on_time=(datetime.time(7, 45), datetime.time(8, 15)), refresh_interval=600, pending_grace=3600, changes=None):
+        self._loader = loader
+        self._changes = changes
+        self._cursor = None
+        self.timezone = pytz.timezone(timezone)
+        self.on_time = on_time
+        self.refresh_interval = refresh_interval
+        self.pending_grace = pending_grace
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._loaded_at = None
+        self._events = defaultdict(_event_state)
+        self._seen = set()
+        # Logs applied locally, kept across re-backfills until Airtable has them
+        self._pending = {}
+        self.total_user = 0
+
+    def ensure_fresh(self):
+        if self._loaded_at is None:
+            self.refresh()
+        elif time.monotonic() - self._loaded_at > self.refresh_interval and not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self.refresh, name="rollup-refresh", daemon=True).start()
+        self._follow()
+
+    def _follow(self):
+        if self._changes is None or self._cursor is None:
+            return
+        with self._lock:
+            # Logs applied here already are skipped by their key
+            self._cursor, records, total_user = self._changes(self._cursor)
+            for record in records:
+                self._apply(self._events, self._seen, record.get("fields", {}))
+            if total_user is not None:
+                self.total_user = total_user
+
+    def invalidate(self):
+        # Force the next dashboard read to start a re-backfill
+        if self._loaded_at is not None:
+            self._loaded_at -= self.refresh_interval + 1
+
+    def refresh(self):
+        try:
+            # Taken first, so whatever lands during the backfill is followed
+            cursor = self._changes(None)[0] if self._changes else None
+            total_user, logs = self._loader()
+            events = defaultdict(_event_state)
+            seen = set()
+            for record in logs:
+                self._apply(events, seen, record.get("fields", {}))
+            with self._lock:
+                cutoff = time.monotonic() - self.pending_grace
+                for key, applied_at in list(self._pending.items()):
+                    if key in seen or applied_at < cutoff:
+                        del self._pending[key]
+                    else:
+                        self._apply(events, seen, dict(zip(("event", "user_id", "timestamp"), key)))
+                self._events, self._seen = events, seen
+                self.total_user = total_user
+                self._cursor = cursor
+                self._loaded_at = time.monotonic()
+        finally:
+            self._refreshing = False
+
+    def apply_log(self, fields):
+        with self._lock:
+            key = self._apply(self._events, self._seen, fields)
+            if key:
+                self._pending[key] = time.monotonic()
+
+    def discard_log(self, fields):
+        with self._lock:
+            self._pending.pop((fields.get("event"), fields.get("user_id"), fields.get("timestamp")), None)
+        self.invalidate()
+
+    def user_added(self):
+        with self._lock:
+            self.total_user += 1
+
+    def user_removed(self):
+        with self._lock:
+            self.total_user = max(self.total_user - 1, 0)
+
+    def _apply(self, events, seen, fields):
+        user_id = fields.get("user_id")
+        timestamp = fields.get("timestamp")
+        if not user_id or not timestamp:
+            return None
+        key = (fields.get("event"), user_id, timestamp)
+        if key in seen:
+            return None
+        try:
+            dt = datetime.datetime.fromisoformat(timestamp.replace("Z", "+00:00")).astimezone(self.timezone)
+        except ValueError:
+            return None
+        seen.add(key)
+        state = events[fields.get("event")]
+        date_only = dt.date().isoformat()
+        state["days"][date_only].add(user_id)
+        state["hours"][date_only][dt.hour] += 1
+        if self.on_time[0] <= dt.time() <= self.on_time[1]:
+            state["on_time"][date_only].add(user_id)
+        else:
+            state["late"][date_only].add(user_id)
+        return key
+
+    def summary(self, event, days):
+        """Dashboard numbers for ``event``; ``days=0`` returns every recorded day."""
+        today = datetime.datetime.now(self.timezone).date()
+        today_key = today.isoformat()
+        with self._lock:
+            state = self._events.get(event) or _event_state()
+            total_user = self.total_user
+            total_attendance = len(state["on_time"].get(today_key, ()))
+            total_late = len(state["late"].get(today_key, ()))
+            daily_attendance = [{"date": date, "count": len(user_ids)} for date, user_ids in sorted(state["days"].items(), reverse=True)]
+
+            attendance_heatmap = []
+            if days == 0:
+                for date_key, hour_value in sorted(state["hours"].items(), reverse=True):
+                    for hour_key, count_value in sorted(hour_value.items()):
+                        attendance_heatmap.append({"date": date_key, "hour": hour_key, "count": count_value})
+            else:
+                for offset in range(days - 1, -1, -1):
+                    date_str = (today - datetime.timedelta(days=offset)).isoformat()
+                    hour_value = state["hours"].get(date_str, {})
+                    for hour in range(24):
+                        attendance_heatmap.append({"date": date_str, "hour": hour, "count": hour_value.get(hour, 0)})
+
+        return {
+            "total_user": total_user,
+            "total_attendance_today": total_attendance,
+            "total_late_today": total_late,
+            "total_absence_today": total_user - total_attendance - total_late,
+            "daily_attendance": daily_attendance,
+            "hourly_attendance": attendance_heatmap,
+        }
@@ -0,0 +1,309 @@
+"""Offline benchmarks for the scan, registration and dashboard hot paths.
+
+Each user count runs in its own process: the backend is imported against
+the in-process Airtable stand-in (``AIRTABLE_API_URL=local://airtable``)
+inside a scratch directory, seeded with synthetic users and logs, started
+the way ``app.py`` starts in production, and then driven through Flask's
+test client. Nothing touches the network or the real data files.
+
+Reported per user count:
+
+* p50/p95/p99 latency and requests per second for ``/dashboard``,
+  ``/facescanner`` (with an email, and as a 1:N identification) and
+  ``/register``
+* microbenchmarks of the individual stages (base64 and PIL decode, the
+  quality gate, detection plus embedding, Fernet decrypt, the index query,
+  the dashboard rollups and a mirror search)
+* how long startup took (seeding aside)
+
+Usage, from ``backend/``::
+
+    python benchmarks/run.py --sizes 100,1000 --output results.json
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json
+
+With ``--baseline`` the run exits non-zero when any p95 regresses by more
+than ``--tolerance``. Baselines are machine specific, so none is shipped;
+record one on the machine that runs the comparison. The stand-in evaluates
+formulas by scanning every record, so Airtable lookups that miss the caches
+grow with the user count in a way the real API does not; use
+``--airtable-latency-ms`` to add a fixed round trip per call instead of
+trusting the stand-in's own cost.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic  # noqa: E402
+
+USERS_TABLE = "Registration"
+LOGS_TABLE = "Logs"
+EVENT = "Tech Conference"
+FRAME_POOL = 20
+# Differences below this are noise whatever the relative change
+NOISE_FLOOR_MS = 0.5
+
+
+def percentiles(samples):
+    values = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3), "n": len(samples)}
+
+
+def drive(app_module, make_request, count, concurrency, warmup):
+    """Send ``count`` requests from ``concurrency`` threads, one test client each."""
+    local = threading.local()
+
+    def one(index):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app_module.app.test_client()
+        started = time.perf_counter()
+        response = make_request(client, index)
+        return time.perf_counter() - started, response.status_code
+
+    for index in range(warmup):
+        one(count + index)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(count)))
+    elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    stats = percentiles([latency for latency, _ in results])
+    stats["rps"] = round(count / elapsed, 2)
+    stats["statuses"] = statuses
+    return stats
+
+
+def micro(fn, iterations):
+    samples = []
+    for index in range(iterations):
+        started = time.perf_counter()
+        fn(index)
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def run_size(args, users):
+    """Benchmark one user count; runs in a fresh process."""
+    workdir = tempfile.mkdtemp(prefix="veridface-bench-")
+    os.chdir(workdir)
+    os.environ.update({
+        "AIRTABLE_API_URL": "local://airtable",
+        "AIRTABLE_BASE_ID": "appBenchmark",
+        "AIRTABLE_PAT": "benchmark",
+        "AIRTABLE_TABLE_NAME": USERS_TABLE,
+        "AIRTABLE_LOGS_TABLE_NAME": LOGS_TABLE,
+    })
+    if args.face_workers is not None:
+        os.environ["FACE_POOL_WORKERS"] = str(args.face_workers)
+    sys.path.insert(0, BACKEND_DIR)
+
+    import app as backend
+    import face_pipeline
+    import frame_quality
+
+    local = backend.airtable.local
+    if args.airtable_latency_ms:
+        send = local.send
+
+        def delayed_send(request, **kwargs):
+            time.sleep(args.airtable_latency_ms / 1000)
+            return send(request, **kwargs)
+
+        local.send = delayed_send
+
+    print(f"⏱️ Seeding {users} users")
+    seeded = synthetic.seed_users(local, USERS_TABLE, backend.codec.encode, users, seed=args.seed)
+    synthetic.seed_logs(local, LOGS_TABLE, seeded, int(users * args.logs_per_user), events=(EVENT, "Workshop"), seed=args.seed)
+
+    startup = {}
+    for name, step in (
+        ("face_index_load", backend.face_index.ensure_loaded),
+        ("face_pool_start", backend.face_pool.start),
+        ("outbox_start", backend.airtable_outbox.start),
+        ("mirror_sync", lambda: wait_for_mirror(backend, args.mirror_timeout)),
+        ("rollups_backfill", backend.rollups.ensure_fresh),
+    ):
+        started = time.perf_counter()
+        step()
+        startup[name] = round(time.perf_counter() - started, 3)
+
+    frames = [synthetic.face_image(args.seed + index) for index in range(FRAME_POOL)]
+    urls = [synthetic.data_url(frame) for frame in frames]
+    rng = random.Random(args.seed)
+    emails = [rng.choice(seeded)["fields"]["Email"] for _ in range(args.requests * 2)]
+
+    endpoints = {
+        "dashboard": drive(backend, lambda client, index: client.get(f"/dashboard?days=14&event={EVENT}"), args.requests, args.concurrency, args.warmup),
+        "facescanner": drive(backend, lambda client, index: client.post("/facescanner", json={
+            "email": emails[index % len(emails)], "event": EVENT, "image": urls[index % FRAME_POOL],
+        }), args.requests, args.concurrency, args.warmup),
+        "facescanner_identify": drive(backend, lambda client, index: client.post("/facescanner", json={
+            "event": EVENT, "image": urls[index % FRAME_POOL],
+        }), args.requests, args.concurrency, args.warmup),
+        "register": drive(backend, lambda client, index: client.post("/register", json={
+            "name": f"New User {index}", "email": f"new{index}@bench.local", "phone": "0800000000",
+            "image": synthetic.data_url(synthetic.face_image(args.seed + 100000 + index)),
+        }), args.register_requests, args.concurrency, args.warmup),
+    }
+
+    thresholds = dict(frame_quality.DEFAULT_THRESHOLDS)
+    decoded = [face_pipeline.load_image(frame, max_side=640)[0] for frame in frames]
+    tokens = [record["fields"]["FaceEncoding"] for record in seeded[:FRAME_POOL]]
+    probes = synthetic.encodings(FRAME_POOL, seed=args.seed + 1)
+    iterations = args.micro_iterations
+
+    def quality_gate(index):
+        small, _ = frame_quality.shrink(decoded[index % FRAME_POOL], thresholds["detect_side"])
+        frame_quality.check_image(frame_quality.to_gray(small), thresholds)
+
+    stages = {
+        "base64_decode": micro(lambda index: backend.decode_base64_image(urls[index % FRAME_POOL]), iterations),
+        "pil_decode": micro(lambda index: face_pipeline.load_image(frames[index % FRAME_POOL], max_side=640), iterations),
+        "quality_gate": micro(quality_gate, iterations),
+        "encode_faces": micro(lambda index: face_pipeline.encode_faces(frames[index % FRAME_POOL], backend.FACE_OPTIONS["scan"]), max(iterations // 10, 5)),
+        "fernet_decrypt": micro(lambda index: backend.decrypt_encoding(tokens[index % len(tokens)]), iterations),
+        "index_query": micro(lambda index: backend.face_index.query(probes[index % FRAME_POOL], k=1, tolerance=backend.MATCH_TOLERANCE), iterations),
+        "rollups_summary": micro(lambda index: backend.rollups.summary(EVENT, 14), iterations),
+        "mirror_search": micro(lambda index: backend.mirror.query("users", search=f"user{index}", search_fields=backend.USER_SEARCH_FIELDS, limit=20), iterations),
+    }
+    backend.face_pool.shutdown()
+    return {"startup_s": startup, "endpoints": endpoints, "stages": stages}
+
+
+def wait_for_mirror(backend, timeout):
+    backend.mirror.start()
+    deadline = time.monotonic() + timeout
+    while not backend.mirror.ready:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Mirror did not finish its first sync")
+        time.sleep(0.05)
+
+
+# Reporting -------------------------------------------------------------------
+
+def print_results(results):
+    for users, result in results.items():
+        print(f"\n=== {users} users ===")
+        print("startup: " + ", ".join(f"{name} {seconds}s" for name, seconds in result["startup_s"].items()))
+        print(f"{'endpoint':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}  statuses")
+        for name, stats in result["endpoints"].items():
+            print(f"{name:<22}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['rps']:>10}  {stats['statuses']}")
+        print(f"{'stage':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name, stats in result["stages"].items():
+            print(f"{name:<22}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+
+
+def compare(results, baseline, tolerance):
+    """Print p95 changes against ``baseline``; return the regressions."""
+    regressions = []
+    print(f"\n=== Against baseline (tolerance {tolerance:.0%}) ===")
+    for users, result in results.items():
+        previous = baseline.get("results", {}).get(users)
+        if previous is None:
+            print(f"{users} users: not in baseline")
+            continue
+        for section in ("endpoints", "stages"):
+            for name, stats in result[section].items():
+                old = previous.get(section, {}).get(name)
+                if old is None:
+                    continue
+                change = (stats["p95_ms"] - old["p95_ms"]) / old["p95_ms"] if old["p95_ms"] else 0.0
+                regressed = change > tolerance and stats["p95_ms"] - old["p95_ms"] > NOISE_FLOOR_MS
+                marker = "  REGRESSION" if regressed else ""
+                print(f"{users:>7} {name:<22} p95 {old['p95_ms']:>9} -> {stats['p95_ms']:>9} ms ({change:+.1%}){marker}")
+                if regressed:
+                    regressions.append((users, name))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", default="100,1000,10000,100000", help="comma separated user counts")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scan/dashboard endpoint")
+    parser.add_argument("--register-requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--logs-per-user", type=float, default=2.0)
+    parser.add_argument("--micro-iterations", type=int, default=200)
+    parser.add_argument("--face-workers", type=int, help="override FACE_POOL_WORKERS")
+    parser.add_argument("--airtable-latency-ms", type=float, default=0.0, help="simulated round trip added to every Airtable call")
+    parser.add_argument("--mirror-timeout", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="compare against a results file")
+    parser.add_argument("--save-baseline", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative p95 increase")
+    parser.add_argument("--worker-size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker_size is not None:
+        result = run_size(args, args.worker_size)
+        with open(args.worker_output, "w") as f:
+            json.dump(result, f)
+        return 0
+
+    forwarded = list(argv if argv is not None else sys.argv[1:])
+    results = {}
+    for users in [int(size) for size in args.sizes.split(",") if size.strip()]:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as handle:
+            output = handle.name
+        try:
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), *forwarded, "--worker-size", str(users), "--worker-output", output],
+                check=True,
+            )
+            with open(output) as f:
+                results[str(users)] = json.load(f)
+        finally:
+            os.unlink(output)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "args": {key: value for key, value in vars(args).items() if not key.startswith("worker") and key not in ("output", "baseline", "save_baseline")},
+        },
+        "results": results,
+    }
+    print_results(results)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"\n💾 Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} p95 regressions")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Synthetic data for the benchmarks: face-like frames, encodings and logs.
+
+Everything is derived from a seed, so two runs with the same arguments
+send the same images and seed the same records.
+"""
+import base64
+import datetime
+import io
+import random
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+ENCODING_DIM = 128
+# Real dlib embeddings have components of roughly this spread
+ENCODING_SCALE = 0.09
+
+
+def face_image(seed, size=(640, 480), quality=85):
+    """A JPEG frame with a frontal cartoon face over a textured background.
+
+    The face has the contrast layout HOG detectors key on (dark eyes and
+    brows, a nose shadow and a mouth inside a lighter oval) and the noise
+    keeps the frame above the sharpness threshold of the quality gate.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    background = rng.normal(120, 35, (height, width, 3)).clip(0, 255).astype(np.uint8)
+    img = Image.fromarray(background).filter(ImageFilter.GaussianBlur(1))
+    draw = ImageDraw.Draw(img)
+
+    face_w = int(width * rng.uniform(0.28, 0.36))
+    face_h = int(face_w * 1.3)
+    cx = width // 2 + int(rng.integers(-width // 20, width // 20 + 1))
+    cy = height // 2 + int(rng.integers(-height // 20, height // 20 + 1))
+    skin = tuple(int(value) for value in rng.integers((150, 110, 90), (235, 195, 170)))
+    draw.ellipse((cx - face_w // 2, cy - face_h // 2, cx + face_w // 2, cy + face_h // 2), fill=skin)
+
+    eye_dx, eye_y = face_w // 5, cy - face_h // 8
+    eye_r = max(face_w // 16, 3)
+    for side in (-1, 1):
+        ex = cx + side * eye_dx
+        draw.ellipse((ex - 2 * eye_r, eye_y - eye_r, ex + 2 * eye_r, eye_y + eye_r), fill=(245, 245, 245))
+        draw.ellipse((ex - eye_r, eye_y - eye_r, ex + eye_r, eye_y + eye_r), fill=(40, 30, 25))
+        draw.line((ex - 2 * eye_r, eye_y - 3 * eye_r, ex + 2 * eye_r, eye_y - 3 * eye_r), fill=(50, 35, 25), width=max(eye_r // 2, 2))
+    shade = tuple(max(value - 50, 0) for value in skin)
+    draw.polygon([(cx, eye_y), (cx - eye_r * 2, cy + face_h // 8), (cx + eye_r * 2, cy + face_h // 8)], fill=shade)
+    mouth_y = cy + face_h // 4
+    draw.chord((cx - face_w // 5, mouth_y - eye_r * 2, cx + face_w // 5, mouth_y + eye_r * 2), 0, 180, fill=(150, 50, 60))
+
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def data_url(image_bytes):
+    return "data:image/jpeg;base64," + base64.b64encode(image_bytes).decode()
+
+
+def encodings(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(0, ENCODING_SCALE, (count, ENCODING_DIM))
+
+
+def seed_users(local, table, encode, count, seed=0):
+    """Insert ``count`` registered users straight into the stand-in.
+
+    ``encode`` turns an encoding into the stored ``FaceEncoding`` value,
+    normally the app's ``codec.encode``. Returns the inserted records.
+    """
+    records = []
+    created = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=30)
+    for index, encoding in enumerate(encodings(count, seed)):
+        records.append(local.insert(table, {
+            "Name": f"Bench User {index}",
+            "Email": f"user{index}@bench.local",
+            "Phone": f"08{index:010d}",
+            "DigitalID": f"BIL-{1000 + index % 9000}",
+            "FaceEncoding": encode(encoding),
+            "Timestamp": created.isoformat().replace("+00:00", "Z"),
+        }))
+    return records
+
+
+def seed_logs(local, table, users, count, days=14, events=("Tech Conference",), seed=0):
+    """Insert ``count`` check-in logs spread over the last ``days`` days."""
+    rng = random.Random(seed)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for _ in range(count):
+        user = rng.choice(users)
+        event = rng.choice(events)
+        timestamp = now - datetime.timedelta(days=rng.randrange(days), hours=rng.random() * 10, minutes=rng.random() * 60)
+        local.insert(table, {
+            "user_id": user["id"],
+            "venue": "Main Hall",
+            "event": event,
+            "title": f"User ({user['fields']['Name']}) Have Scan Attendance To Event ({event})",
+            "timestamp": timestamp.isoformat().replace("+00:00", "Z"),
+            "confidence_score": f"{round(rng.uniform(0.6, 0.9), 3)}",
+        })
@@ -0,0 +1,301 @@
+"""Bulk registration from a CSV of attendees and a folder or zip of photos.
+
+The CSV needs ``name``, ``email`` and ``phone`` columns (header names are
+case-insensitive) and may name each row's photo in a ``photo`` column;
+without one the photo is looked up as ``<email>.jpg`` (or ``.jpeg``,
+``.png``, ``.webp``). Faces are encoded on a process pool, checked against
+the face index and against the rest of the batch, and registered ten
+records per Airtable call.
+
+Progress is appended to a JSON-lines file as it is made, so an interrupted
+import picks up where it stopped when run again with the same file. Rows
+that ended in a final status are skipped; failed rows are retried.
+
+Run from ``backend/``::
+
+    python bulk_import.py attendees.csv photos.zip --progress attendees.progress
+"""
+import argparse
+import csv
+import datetime
+import json
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+import face_pipeline
+from airtable import BATCH_SIZE
+
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+CREATED = "created"
+EXISTS = "exists"            # email already registered
+DUPLICATE = "duplicate"      # face matches an existing user or an earlier row
+REJECTED = "rejected"        # quality gate, no face or an unreadable photo
+MISSING_PHOTO = "missing_photo"
+INVALID = "invalid"          # required column empty
+FAILED = "failed"            # Airtable refused the batch or a worker died; retried on resume
+FINAL = (CREATED, EXISTS, DUPLICATE, REJECTED, MISSING_PHOTO, INVALID)
+
+
+class PhotoSource:
+    """Photos from a directory tree or a zip file, looked up by file name."""
+
+    def __init__(self, path):
+        self._zip = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+        self._names = {}
+        if self._zip is not None:
+            for name in self._zip.namelist():
+                if not name.endswith("/"):
+                    self._names.setdefault(os.path.basename(name).lower(), name)
+        else:
+            for root, _, files in os.walk(path):
+                for name in files:
+                    self._names.setdefault(name.lower(), os.path.join(root, name))
+
+    def find(self, photo=None, email=None):
+        candidates = [photo] if photo else [email + ext for ext in PHOTO_EXTENSIONS] if email else []
+        for candidate in candidates:
+            name = self._names.get(os.path.basename(candidate).lower())
+            if name:
+                return name
+        return None
+
+    def read(self, name):
+        if self._zip is not None:
+            return self._zip.read(name)
+        with open(name, "rb") as f:
+            return f.read()
+
+
+class ImportProgress:
+    """Append-only JSON-lines record of what happened to each row."""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    self.rows[entry["row"]] = entry
+
+    def done(self, row):
+        entry = self.rows.get(row)
+        return entry is not None and entry["status"] in FINAL
+
+    def record(self, entries):
+        if not entries:
+            return
+        with open(self.path, "a") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+                self.rows[entry["row"]] = entry
+            f.flush()
+            os.fsync(f.fileno())
+
+    def counts(self):
+        counts = {}
+        for entry in self.rows.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return counts
+
+
+def read_rows(csv_path):
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield {(key or "").strip().lower(): (value or "").strip() for key, value in row.items()}
+
+
+class BulkImporter:
+    """Registers attendees in bulk; see the module docstring.
+
+    ``known_emails`` maps already registered emails to record ids.
+    ``on_created(records, encodings)`` runs after every accepted batch with
+    the Airtable records and their encodings, in the same order.
+    """
+
+    def __init__(self, client, table, codec, face_index, options, tolerance, known_emails, make_digital_id, workers=None, on_created=None):
+        self.client = client
+        self.table = table
+        self.codec = codec
+        self.face_index = face_index
+        self.options = options
+        self.tolerance = tolerance
+        self.known_emails = known_emails
+        self.make_digital_id = make_digital_id
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.on_created = on_created
+
+    def run(self, csv_path, photos_path, progress_path, status=None):
+        """Import every unfinished row; ``status`` (a dict) is kept current."""
+        status = status if status is not None else {}
+        progress = ImportProgress(progress_path)
+        photos = PhotoSource(photos_path)
+        rows = list(enumerate(read_rows(csv_path), start=1))
+        status.update(total=len(rows), counts=progress.counts())
+        self.face_index.ensure_loaded()
+
+        todo, skipped = [], []
+        for number, row in rows:
+            if progress.done(number):
+                continue
+            entry = self._precheck(number, row, photos)
+            if entry is not None:
+                skipped.append(entry)
+            else:
+                todo.append((number, row))
+        progress.record(skipped)
+        status["counts"] = progress.counts()
+
+        executor = None
+        if self.workers:
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=face_pipeline.init_worker,
+            )
+        try:
+            batch = []
+            # The next chunk is encoding while this one is screened and sent;
+            # the read-ahead keeps only a few photos per worker in memory
+            chunk = max(self.workers, 1) * 4
+            parts = [todo[start:start + chunk] for start in range(0, len(todo), chunk)]
+            pending = self._encode(executor, photos, parts[0]) if parts else []
+            for index, part in enumerate(parts):
+                current = pending
+                if index + 1 < len(parts):
+                    pending = self._encode(executor, photos, parts[index + 1])
+                for (number, row), future in zip(part, current):
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool as e:
+                        entry = {"row": number, "email": row["email"].lower(), "status": FAILED, "reason": f"encoding worker died: {e}"}
+                    except Exception as e:
+                        entry = {"row": number, "email": row["email"].lower(), "status": REJECTED, "reason": f"unreadable photo: {e}"}
+                    else:
+                        entry = self._screen(number, row, result, batch)
+                    if entry is not None:
+                        progress.record([entry])
+                        continue
+                    batch.append((number, row, result["encodings"][0]))
+                    if len(batch) == BATCH_SIZE:
+                        progress.record(self._create(batch))
+                        batch = []
+                status["counts"] = progress.counts()
+            if batch:
+                progress.record(self._create(batch))
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        status["counts"] = progress.counts()
+        return status["counts"]
+
+    def _precheck(self, number, row, photos):
+        email = row.get("email", "").lower()
+        if not row.get("name") or not email:
+            return {"row": number, "email": email, "status": INVALID, "reason": "name and email are required"}
+        if email in self.known_emails:
+            return {"row": number, "email": email, "status": EXISTS, "record_id": self.known_emails[email]}
+        row["_photo"] = photos.find(row.get("photo"), email)
+        if row["_photo"] is None:
+            return {"row": number, "email": email, "status": MISSING_PHOTO}
+        return None
+
+    def _encode(self, executor, photos, part):
+        """One future per row; a photo that cannot be read or encoded fails
+        only its own future."""
+        futures = []
+        for _, row in part:
+            try:
+                image = photos.read(row["_photo"])
+                if executor is not None:
+                    futures.append(executor.submit(face_pipeline.encode_faces, image, self.options))
+                    continue
+                future = Future()
+                future.set_result(face_pipeline.encode_faces(image, self.options))
+            except Exception as e:
+                future = Future()
+                future.set_exception(e)
+            futures.append(future)
+        return futures
+
+    def _screen(self, number, row, result, batch):
+        email = row["email"].lower()
+        if email in self.known_emails:
+            # Registered by an earlier row of this import
+            return {"row": number, "email": email, "status": EXISTS, "record_id": self.known_emails[email]}
+        if result["rejected"]:
+            return {"row": number, "email": email, "status": REJECTED, "reason": result["rejected"]}
+        encoding = result["encodings"][0]
+        matches = self.face_index.query(encoding, k=1, tolerance=self.tolerance)
+        if matches:
+            return {"row": number, "email": email, "status": DUPLICATE, "duplicate_of": matches[0][0]}
+        # Rows of the batch being assembled are not in the index yet
+        for other_number, other_row, other_encoding in batch:
+            if other_row["email"].lower() == email:
+                return {"row": number, "email": email, "status": EXISTS, "duplicate_of_row": other_number}
+            if np.linalg.norm(other_encoding - encoding) <= self.tolerance:
+                return {"row": number, "email": email, "status": DUPLICATE, "duplicate_of_row": other_number}
+        return None
+
+    def _create(self, batch):
+        timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+        records = [
+            {
+                "Name": row["name"],
+                "Email": row["email"].lower(),
+                "Phone": row.get("phone", ""),
+                "DigitalID": self.make_digital_id(),
+                "FaceEncoding": self.codec.encode(encoding),
+                "Timestamp": timestamp,
+            }
+            for _, row, encoding in batch
+        ]
+        res = self.client.rate_limited(self.client.create_records, self.table, records)
+        if res.status_code != 200:
+            print("❌ Bulk import batch failed:", res.status_code, res.text)
+            return [{"row": number, "email": row["email"].lower(), "status": FAILED, "reason": f"Airtable {res.status_code}"} for number, row, _ in batch]
+
+        created = res.json()["records"]
+        encodings = [encoding for _, _, encoding in batch]
+        for record, encoding in zip(created, encodings):
+            self.face_index.upsert(record["id"], encoding)
+            self.known_emails[record["fields"]["Email"]] = record["id"]
+        if self.on_created:
+            self.on_created(created, encodings)
+        return [
+            {"row": number, "email": row["email"].lower(), "status": CREATED, "record_id": record["id"]}
+            for (number, row, _), record in zip(batch, created)
+        ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Register attendees in bulk from a CSV and a folder or zip of photos.")
+    parser.add_argument("csv", help="CSV with name, email, phone and optionally photo columns")
+    parser.add_argument("photos", help="directory or zip file with the photos")
+    parser.add_argument("--progress", help="progress file (default: <csv>.progress)")
+    parser.add_argument("--workers", type=int, help="encoding processes (default: one per core)")
+    args = parser.parse_args(argv)
+
+    # The app module holds the configured client, codec, index and hooks
+    import app
+
+    progress_path = args.progress or args.csv + ".progress"
+    counts = app.make_bulk_importer(workers=args.workers).run(args.csv, args.photos, progress_path)
+    # Registration logs go through the outbox; send them before exiting
+    while app.airtable_outbox.pending() and app.airtable_outbox.flush_once():
+        pass
+    print(f"✅ Bulk import finished: {counts}")
+
+
+if __name__ == "__main__":
+    main()
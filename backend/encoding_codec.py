@@ -0,0 +1,171 @@
+"""Storage format for the ``FaceEncoding`` field, and the keyring behind it.
+
+Current records look like ``fe2.<key id>.<Fernet token>``. The key id (the
+first 8 hex digits of the key's SHA-256) says which key to decrypt with,
+and the encrypted payload starts with a small header giving the format
+version, the element type and the dimension:
+
+* ``f32``: 128 float32 values, 512 bytes, about half a legacy record
+* ``i8``: a float32 scale and 128 int8 values, 132 bytes; distances move
+  by well under 0.01, far inside the 0.45 match tolerance
+
+Legacy records are bare Fernet tokens around 128 float64 values and are
+decoded with whichever key in the ring opens them.
+
+The keyring is a text file with one Fernet key per line, the first being
+the one new records are written with. Without it the single ``secret.key``
+is used. ``migrate_encodings.py`` rewrites records into the current format
+and key, and can add and retire keys.
+"""
+import hashlib
+import os
+import struct
+import threading
+
+import numpy as np
+from cryptography.fernet import Fernet, MultiFernet
+
+PREFIX = "fe2"
+VERSION = 2
+ENCODING_DIM = 128
+FORMATS = {"f32": 1, "i8": 2}
+FORMAT_NAMES = {code: name for name, code in FORMATS.items()}
+PAYLOAD_HEADER = struct.Struct("<BBH")  # version, format, dim
+SCALE = struct.Struct("<f")
+
+
+def key_id(key):
+    return hashlib.sha256(key).hexdigest()[:8]
+
+
+def read_keys(keyring_path, legacy_key_path=None):
+    if os.path.exists(keyring_path):
+        with open(keyring_path, "rb") as f:
+            keys = [line.strip() for line in f if line.strip()]
+        if keys:
+            return keys
+    if legacy_key_path and os.path.exists(legacy_key_path):
+        with open(legacy_key_path, "rb") as f:
+            return [f.read().strip()]
+    raise FileNotFoundError(f"No encryption keys in {keyring_path} or {legacy_key_path}")
+
+
+def write_keys(keyring_path, keys):
+    tmp_path = f"{keyring_path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(b"".join(key + b"\n" for key in keys))
+    os.replace(tmp_path, keyring_path)
+
+
+class EncodingCodec:
+    """Encrypts and decrypts face encodings in every stored format.
+
+    ``fernet`` is a ``MultiFernet`` over the whole ring, for other data that
+    should follow the same keys (the encoding snapshot's delta log).
+    """
+
+    def __init__(self, keyring_path, legacy_key_path=None, format="f32"):
+        self.keyring_path = keyring_path
+        self.legacy_key_path = legacy_key_path
+        self.format = format
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """Re-read the keyring, e.g. after another process added a key."""
+        keys = read_keys(self.keyring_path, self.legacy_key_path)
+        with self._lock:
+            self.keys = keys
+            self.primary_id = key_id(keys[0])
+            self._fernets = {key_id(key): Fernet(key) for key in keys}
+            self.fernet = MultiFernet([Fernet(key) for key in keys])
+
+    @property
+    def primary_key(self):
+        return self.keys[0]
+
+    def _fernet_for(self, kid):
+        fernet = self._fernets.get(kid)
+        if fernet is None:
+            self.reload()
+            fernet = self._fernets.get(kid)
+        if fernet is None:
+            raise KeyError(f"Unknown encoding key {kid}")
+        return fernet
+
+    # Encoding ----------------------------------------------------------------
+
+    def encode(self, encoding, format=None):
+        code = FORMATS[format or self.format]
+        values = np.asarray(encoding, dtype=np.float32).ravel()
+        header = PAYLOAD_HEADER.pack(VERSION, code, values.size)
+        if code == FORMATS["i8"]:
+            peak = float(np.abs(values).max()) if values.size else 0.0
+            scale = peak / 127 if peak > 0 else 1.0
+            body = SCALE.pack(scale) + np.round(values / scale).astype(np.int8).tobytes()
+        else:
+            body = values.tobytes()
+        token = self._fernets[self.primary_id].encrypt(header + body).decode()
+        return f"{PREFIX}.{self.primary_id}.{token}"
+
+    # Decoding ----------------------------------------------------------------
+
+    @staticmethod
+    def key_of(stored):
+        """Key id of a stored value, or None for a legacy record."""
+        parts = stored.split(".", 2)
+        if len(parts) == 3 and parts[0] == PREFIX:
+            return parts[1]
+        return None
+
+    def is_current(self, stored, format=None):
+        """True when ``stored`` uses the primary key (and ``format``, if given).
+        Only the prefix is read unless the format has to be checked."""
+        if self.key_of(stored) != self.primary_id:
+            return False
+        if format is None:
+            return True
+        return self._payload(stored)[1] == FORMATS[format]
+
+    def _payload(self, stored):
+        kid = self.key_of(stored)
+        if kid is None:
+            return None, None, self.fernet.decrypt(stored.encode())
+        payload = self._fernet_for(kid).decrypt(stored.split(".", 2)[2].encode())
+        version, code, dim = PAYLOAD_HEADER.unpack_from(payload)
+        if version != VERSION or code not in FORMAT_NAMES:
+            raise ValueError(f"Unsupported encoding format {version}/{code}")
+        return dim, code, payload[PAYLOAD_HEADER.size:]
+
+    def _values(self, stored, out):
+        dim, code, body = self._payload(stored)
+        if code is None:
+            out[:] = np.frombuffer(body, dtype=np.float64)
+        elif code == FORMATS["f32"]:
+            out[:] = np.frombuffer(body, dtype=np.float32, count=dim)
+        else:
+            scale = SCALE.unpack_from(body)[0]
+            out[:] = np.frombuffer(body, dtype=np.int8, count=dim, offset=SCALE.size)
+            out *= scale
+
+    def decode(self, stored):
+        encoding = np.empty(ENCODING_DIM, dtype=np.float64)
+        self._values(stored, encoding)
+        return encoding
+
+    def decode_many(self, values):
+        """Decode a batch straight into one float32 matrix.
+
+        Returns the matrix and a mask of the rows that decoded; unreadable
+        values leave their row zeroed instead of failing the batch.
+        """
+        matrix = np.zeros((len(values), ENCODING_DIM), dtype=np.float32)
+        ok = np.zeros(len(values), dtype=bool)
+        for row, stored in enumerate(values):
+            try:
+                self._values(stored, matrix[row])
+                ok[row] = True
+            except Exception as e:
+                print("⚠️ Skipping invalid encoding:", e)
+        return matrix, ok
@@ -0,0 +1,256 @@
+import hashlib
+import os
+import struct
+import time
+
+import numpy as np
+
+from face_index import ENCODING_DIM
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines run a single process
+    fcntl = None
+
+MAGIC = b"VFSN"
+VERSION = 2
+ID_WIDTH = 24
+# magic, version, dim, id width, record count, key fingerprint, build time
+HEADER = struct.Struct("<4sHHIQ16sd")
+HEADER_SIZE = 64
+ALIGNMENT = 64
+
+
+def _matrix_offset(count):
+    ids_end = HEADER_SIZE + count * ID_WIDTH
+    return (ids_end + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class _DeltaLock:
+    def __init__(self, path, blocking=True):
+        self.path = path
+        self.blocking = blocking
+
+    def __enter__(self):
+        self.file = open(self.path, "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self.file, fcntl.LOCK_EX if self.blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self.file.close()
+                raise
+        return self.file
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+class EncodingSnapshot:
+    """On-disk snapshot of decrypted encodings plus an append-only delta log.
+
+    Layout of the snapshot file (little endian):
+
+    * 64 byte header: ``HEADER`` padded with zeros
+    * record-id table: ``count`` null-padded ASCII ids, ``ID_WIDTH`` bytes each,
+      sorted so lookups can binary search the mapped table
+    * float32 matrix of ``count x dim``, aligned to 64 bytes
+
+    Every worker maps the file read-only, so the page cache holds a single
+    physical copy however many processes serve requests. The matrix has to be
+    stored in the clear for that to work; the file is created ``0600`` and is
+    tied to the Fernet key by a fingerprint in the header. Changes since the
+    snapshot go to ``<path>.delta`` as Fernet-encrypted lines that every worker
+    tails, and the log is folded back into a fresh snapshot once it grows past
+    ``compact_bytes``.
+
+    The delta log only carries changes made through this backend, so the
+    header also records when the snapshot was last built from the loader;
+    once that is more than ``max_age`` seconds ago the snapshot is ``stale``
+    and ``rebuild`` re-reads the source, which is how records added or
+    deleted directly in Airtable are picked up. A stale snapshot is still
+    mapped at startup, so a restart stays warm and the rebuild runs behind it.
+    """
+
+    def __init__(self, path, cipher, key, compact_bytes=1024 * 1024, max_age=3600):
+        self.path = path
+        self.delta_path = f"{path}.delta"
+        self.rebuild_path = f"{path}.rebuild"
+        self.cipher = cipher
+        self.fingerprint = hashlib.sha256(key).digest()[:16]
+        self.compact_bytes = compact_bytes
+        self.max_age = max_age
+        self._mapped = None
+        self._built = None
+        self._offset = 0
+
+    def load(self, index, loader):
+        with _DeltaLock(self.delta_path):
+            if not self._valid():
+                users = loader() if loader else []
+                print(f"💾 Writing encoding snapshot with {len(users)} users")
+                self._write([record_id for record_id, _ in users], [encoding for _, encoding in users], time.time())
+                open(self.delta_path, "w").close()
+        self._map(index)
+
+    def stale(self):
+        return self._built is not None and time.time() - self._built > self.max_age
+
+    def rebuild(self, loader):
+        """Re-read every record from ``loader`` into a new snapshot.
+
+        The slow read happens without holding the delta lock, so writes go on
+        meanwhile; entries logged since the read started are kept in the log
+        and replayed over the new snapshot. Only one process rebuilds at a
+        time; the others keep serving the old snapshot until it is replaced.
+        Returns False when another process is already rebuilding.
+        """
+        try:
+            with _DeltaLock(self.rebuild_path, blocking=False):
+                with _DeltaLock(self.delta_path) as delta:
+                    started, start_offset = time.time(), os.fstat(delta.fileno()).st_size
+                    snapshot = self._stat()
+                    if self._header_built() != self._built:
+                        return True  # another process rebuilt it since we mapped it
+                users = loader()
+                with _DeltaLock(self.delta_path):
+                    if self._stat() != snapshot:
+                        return False  # compacted meanwhile, the log offset is gone
+                    with open(self.delta_path, "rb") as f:
+                        f.seek(start_offset)
+                        recent = f.read()
+                    self._write([record_id for record_id, _ in users], [encoding for _, encoding in users], started)
+                    with open(self.delta_path, "wb") as f:
+                        f.write(recent)
+        except BlockingIOError:
+            return False
+        print(f"💾 Rebuilt encoding snapshot with {len(users)} users")
+        return True
+
+    def sync(self, index):
+        stat = self._stat()
+        if stat is None:
+            return
+        if stat != self._mapped:
+            self._map(index)
+            return
+        if self._replay(index) > self.compact_bytes:
+            self._compact(index)
+
+    def append_upsert(self, record_id, encoding):
+        payload = np.asarray(encoding, dtype=np.float32).tobytes()
+        token = self.cipher.encrypt(payload).decode()
+        self._append(f"+ {record_id} {token}\n")
+
+    def append_remove(self, record_id):
+        self._append(f"- {record_id}\n")
+
+    def _append(self, line):
+        with _DeltaLock(self.delta_path) as delta:
+            delta.write(line)
+            delta.flush()
+
+    def _valid(self):
+        try:
+            with open(self.path, "rb") as f:
+                header = f.read(HEADER.size)
+                size = os.fstat(f.fileno()).st_size
+        except FileNotFoundError:
+            return False
+        if len(header) != HEADER.size:
+            return False
+        magic, version, dim, id_width, count, fingerprint, _ = HEADER.unpack(header)
+        if (magic, version, dim, id_width) != (MAGIC, VERSION, ENCODING_DIM, ID_WIDTH):
+            return False
+        if fingerprint != self.fingerprint:
+            print("⚠️ Encoding snapshot was written with a different key, rebuilding")
+            return False
+        return size == _matrix_offset(count) + count * ENCODING_DIM * 4
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _header_built(self):
+        try:
+            with open(self.path, "rb") as f:
+                return HEADER.unpack(f.read(HEADER.size))[6]
+        except (FileNotFoundError, struct.error):
+            return None
+
+    def _write(self, record_ids, encodings, built):
+        order = sorted(range(len(record_ids)), key=lambda i: record_ids[i])
+        ids = np.array([record_ids[i].encode() for i in order], dtype=f"S{ID_WIDTH}")
+        matrix = np.empty((len(order), ENCODING_DIM), dtype=np.float32)
+        for row, i in enumerate(order):
+            matrix[row] = encodings[i]
+
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, ENCODING_DIM, ID_WIDTH, len(ids), self.fingerprint, built).ljust(HEADER_SIZE, b"\0"))
+            f.write(ids.tobytes())
+            f.write(b"\0" * (_matrix_offset(len(ids)) - HEADER_SIZE - len(ids) * ID_WIDTH))
+            f.write(matrix.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _map(self, index):
+        with open(self.path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            header = HEADER.unpack(f.read(HEADER.size))
+        count, built = header[4], header[6]
+        if count:
+            ids = np.memmap(self.path, dtype=f"S{ID_WIDTH}", mode="r", offset=HEADER_SIZE, shape=(count,))
+            matrix = np.memmap(self.path, dtype=np.float32, mode="r", offset=_matrix_offset(count), shape=(count, ENCODING_DIM))
+        else:
+            ids = np.empty(0, dtype=f"S{ID_WIDTH}")
+            matrix = np.empty((0, ENCODING_DIM), dtype=np.float32)
+        index.set_base(ids, matrix)
+        self._mapped = (stat.st_ino, stat.st_mtime_ns)
+        self._built = built
+        self._offset = 0
+        self._replay(index)
+
+    def _replay(self, index):
+        """Apply delta lines written since the last call; returns the log size."""
+        try:
+            with open(self.delta_path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < self._offset:
+                    # Log was truncated by a compaction we have not mapped yet
+                    self._offset = 0
+                f.seek(self._offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return 0
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].decode().splitlines():
+            parts = line.split(" ")
+            try:
+                if parts[0] == "+":
+                    encoding = np.frombuffer(self.cipher.decrypt(parts[2].encode()), dtype=np.float32)
+                    index._apply_upsert(parts[1], encoding)
+                elif parts[0] == "-":
+                    index._apply_remove(parts[1])
+            except Exception as e:
+                print("⚠️ Skipping invalid delta entry:", e)
+        self._offset += end
+        return size
+
+    def _compact(self, index):
+        with _DeltaLock(self.delta_path):
+            # Entries are idempotent upserts/removes, so replaying under the
+            # lock makes the snapshot include everything in the log
+            self._replay(index)
+            record_ids, encodings = index.snapshot()
+            print(f"💾 Compacting encoding snapshot with {len(record_ids)} users")
+            # Compaction only folds in our own log, so the build time stays
+            self._write(record_ids, encodings, self._built)
+            open(self.delta_path, "w").close()
+        self._map(index)
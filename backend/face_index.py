@@ -0,0 +1,243 @@
+import threading
+import time
+
+import numpy as np
+
+ENCODING_DIM = 128
+# Wait this long before trying again after a stale snapshot failed to rebuild
+REBUILD_RETRY_SECONDS = 60
+
+
+def _empty_segment():
+    return np.empty(0, dtype=object), np.empty((0, ENCODING_DIM), dtype=np.float32)
+
+
+class FaceIndex:
+    """Resident matrix of every known face encoding for 1:N lookups.
+
+    Encodings live in two segments: a read-only base (usually a memory-mapped
+    snapshot shared by every worker, with record ids sorted) and a small
+    in-memory overlay for changes made since. A query is a single vectorized
+    euclidean distance per segment, the same metric
+    ``face_recognition.face_distance`` uses.
+    """
+
+    def __init__(self, loader=None, store=None):
+        self._loader = loader
+        self._store = store
+        self._lock = threading.Lock()
+        self._rebuilding = threading.Lock()
+        self._rebuild_after = 0
+        self._reset()
+        self.loaded = False
+
+    def _reset(self):
+        # Each segment is swapped as one tuple so lock-free readers never see
+        # ids, rows and the base's dead-row mask from different generations
+        self._base = (np.empty(0, dtype="S1"), np.empty((0, ENCODING_DIM), dtype=np.float32), None)
+        self._extra = _empty_segment()
+        self._extra_rows = {}
+
+    def __len__(self):
+        base_ids, _, dead = self._base
+        dead = 0 if dead is None else int(dead.sum())
+        return len(base_ids) - dead + len(self._extra_rows)
+
+    def __contains__(self, record_id):
+        return record_id in self._extra_rows or self._base_row(record_id) is not None
+
+    def ensure_loaded(self):
+        if self.loaded:
+            self.refresh()
+            return
+        if self._loader is None and self._store is None:
+            return
+        with self._lock:
+            if self.loaded:
+                return
+            if self._store is not None:
+                self._store.load(self, self._loader)
+            else:
+                self._replace(self._loader())
+            self.loaded = True
+        print(f"🧠 Face index loaded with {len(self)} encodings")
+        # An old snapshot is served as-is while it is rebuilt in the background
+        self.refresh()
+
+    def refresh(self):
+        # Pick up changes other workers appended to the shared store
+        if self._store is not None and self.loaded:
+            with self._lock:
+                self._store.sync(self)
+            if self._loader is not None and self._store.stale() and time.monotonic() >= self._rebuild_after:
+                self._start_rebuild()
+
+    def _start_rebuild(self):
+        # Reading the source can take a while; queries keep using the old
+        # snapshot until the next refresh maps the new one
+        if self._rebuilding.acquire(blocking=False):
+            threading.Thread(target=self._rebuild_store, name="face-index-rebuild", daemon=True).start()
+
+    def _rebuild_store(self):
+        try:
+            if not self._store.rebuild(self._loader):
+                self._rebuild_after = time.monotonic() + REBUILD_RETRY_SECONDS
+        except Exception as e:
+            print("❌ Face index rebuild failed:", e)
+            self._rebuild_after = time.monotonic() + REBUILD_RETRY_SECONDS
+        finally:
+            self._rebuilding.release()
+
+    def rebuild(self, users):
+        with self._lock:
+            self._replace(users)
+            self.loaded = True
+
+    def _replace(self, users):
+        # Built as one sorted base segment; upserting row by row would copy
+        # the overlay on every insert
+        latest = dict(users)
+        record_ids = sorted(latest)
+        if not record_ids:
+            self._reset()
+            return
+        encodings = np.asarray([latest[record_id] for record_id in record_ids], dtype=np.float32).reshape(len(record_ids), ENCODING_DIM)
+        self.set_base(np.array([record_id.encode() for record_id in record_ids]), encodings)
+
+    def set_base(self, record_ids, encodings):
+        """Install a sorted, read-only base segment and drop all overlays."""
+        self._reset()
+        self._base = (record_ids, encodings, None)
+
+    def snapshot(self):
+        """Return every live ``(record_ids, encodings)`` pair as plain arrays."""
+        base_ids, base_matrix, dead = self._base
+        extra_ids, extra_matrix = self._extra
+        alive = np.ones(len(base_ids), dtype=bool) if dead is None else ~dead
+        record_ids = [record_id.decode() for record_id in base_ids[alive]] + list(extra_ids)
+        encodings = np.vstack([base_matrix[alive], extra_matrix]).astype(np.float32)
+        return record_ids, encodings
+
+    def _base_row(self, record_id):
+        return self._find_base_row(self._base, record_id)
+
+    @staticmethod
+    def _find_base_row(base, record_id):
+        base_ids, _, dead = base
+        if not len(base_ids):
+            return None
+        key = record_id.encode()
+        row = int(np.searchsorted(base_ids, key))
+        if row < len(base_ids) and base_ids[row] == key:
+            if dead is not None and dead[row]:
+                return None
+            return row
+        return None
+
+    def _kill_base_row(self, record_id):
+        row = self._base_row(record_id)
+        if row is None:
+            return False
+        base_ids, base_matrix, dead = self._base
+        dead = np.zeros(len(base_ids), dtype=bool) if dead is None else dead.copy()
+        dead[row] = True
+        self._base = (base_ids, base_matrix, dead)
+        return True
+
+    def upsert(self, record_id, encoding):
+        if self._store is not None and self.loaded:
+            self._store.append_upsert(record_id, encoding)
+            self.refresh()
+            return
+        with self._lock:
+            self._apply_upsert(record_id, encoding)
+
+    def remove(self, record_id):
+        if self._store is not None and self.loaded:
+            present = record_id in self
+            self._store.append_remove(record_id)
+            self.refresh()
+            return present
+        with self._lock:
+            return self._apply_remove(record_id)
+
+    def _apply_upsert(self, record_id, encoding):
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(ENCODING_DIM)
+        self._kill_base_row(record_id)
+        record_ids, encodings = self._extra
+        row = self._extra_rows.get(record_id)
+        if row is not None:
+            encodings = encodings.copy()
+            encodings[row] = encoding
+            self._extra = (record_ids, encodings)
+            return
+        self._extra = (
+            np.append(record_ids, np.array([record_id], dtype=object)),
+            np.vstack([encodings, encoding]),
+        )
+        self._extra_rows[record_id] = len(record_ids)
+
+    def _apply_remove(self, record_id):
+        removed = self._kill_base_row(record_id)
+        row = self._extra_rows.pop(record_id, None)
+        if row is None:
+            return removed
+        record_ids, encodings = self._extra
+        last = len(record_ids) - 1
+        record_ids, encodings = record_ids.copy(), encodings.copy()
+        if row != last:
+            # Swap the last row into the hole so removal stays O(dim)
+            encodings[row] = encodings[last]
+            record_ids[row] = record_ids[last]
+            self._extra_rows[record_ids[row]] = row
+        self._extra = (record_ids[:last], encodings[:last])
+        return True
+
+    def get(self, record_id):
+        extra_ids, extra_matrix = self._extra
+        row = self._extra_rows.get(record_id)
+        # The row map is updated in place, so check it against this generation
+        if row is not None and row < len(extra_ids) and extra_ids[row] == record_id:
+            return extra_matrix[row]
+        base = self._base
+        row = self._find_base_row(base, record_id)
+        if row is not None:
+            return base[1][row]
+        return None
+
+    def distance_to(self, record_id, encoding):
+        known = self.get(record_id)
+        if known is None:
+            return None
+        return float(np.linalg.norm(known - np.asarray(encoding, dtype=np.float32)))
+
+    def query(self, encoding, k=1, tolerance=None):
+        """Return up to ``k`` ``(record_id, distance)`` pairs, nearest first."""
+        probe = np.asarray(encoding, dtype=np.float32)
+        base_ids, base_matrix, dead = self._base
+        extra_ids, extra_matrix = self._extra
+
+        results = []
+        if len(base_ids):
+            distances = np.linalg.norm(base_matrix - probe, axis=1)
+            if dead is not None:
+                distances[dead] = np.inf
+            results += [(base_ids[i].decode(), distances[i]) for i in self._nearest(distances, k)]
+        if len(extra_ids):
+            distances = np.linalg.norm(extra_matrix - probe, axis=1)
+            results += [(extra_ids[i], distances[i]) for i in self._nearest(distances, k)]
+
+        results = sorted(results, key=lambda item: item[1])[:k]
+        results = [(record_id, float(distance)) for record_id, distance in results if np.isfinite(distance)]
+        if tolerance is not None:
+            results = [(record_id, distance) for record_id, distance in results if distance <= tolerance]
+        return results
+
+    @staticmethod
+    def _nearest(distances, k):
+        k = min(k, len(distances))
+        if k < len(distances):
+            nearest = np.argpartition(distances, k - 1)[:k]
+        else:
+            nearest = np.arange(len(distances))
+        return nearest[np.argsort(distances[nearest])]
@@ -0,0 +1,164 @@
+"""Face pipeline stages that run inside the face worker processes.
+
+Everything here is a plain top-level function so it can be pickled into a
+``ProcessPoolExecutor`` job.
+"""
+import io
+import math
+import time
+
+import numpy as np
+from PIL import Image
+
+import frame_quality
+
+face_recognition = None
+
+
+def init_worker():
+    # Importing face_recognition loads the dlib detector and embedding models
+    global face_recognition
+    import face_recognition as models
+    face_recognition = models
+    warm_up()
+
+
+def warm_up(*_):
+    if face_recognition is None:
+        init_worker()
+        return
+    blank = np.zeros((64, 64, 3), dtype=np.uint8)
+    face_recognition.face_locations(blank)
+    face_recognition.face_encodings(blank, known_face_locations=[(0, 63, 63, 0)])
+    return True
+
+
+def load_image(image_bytes, max_side=None, target_face_px=None, face_box=None):
+    """Decode a frame no larger than the pipeline needs.
+
+    With a ``face_box`` hint the frame is scaled so the face is about
+    ``target_face_px`` tall, otherwise so its longest side is ``max_side``.
+    JPEG frames are first shrunk by the decoder itself (``draft``); whatever
+    is left over is removed with an integer box ``reduce`` and, if that still
+    overshoots, a bilinear resize. Returns the RGB array and the scale.
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+    width, height = img.size
+
+    scale = 1.0
+    if face_box and target_face_px:
+        scale = min(1.0, target_face_px / max(face_box[2] - face_box[0], 1))
+    elif max_side:
+        scale = min(1.0, max_side / max(width, height))
+
+    if scale < 1.0:
+        wanted = (max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale)))
+        if img.format == "JPEG":
+            img.draft("RGB", wanted)
+        if img.mode not in ("RGB", "L"):
+            # reduce() has no palette, bilevel or 16-bit support
+            img = img.convert("RGB")
+        factor = img.size[0] // wanted[0]
+        if factor >= 2:
+            img = img.reduce(factor)
+        if img.size[0] > wanted[0] * 1.25:
+            img = img.resize(wanted, Image.BILINEAR)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return np.asarray(img), img.size[0] / width
+
+
+def frame_size(image_bytes):
+    """Width and height from the image header, or None if it can't be read."""
+    try:
+        return Image.open(io.BytesIO(image_bytes)).size
+    except (OSError, ValueError):
+        return None
+
+
+def scale_face_box(face_box, scale, shape):
+    height, width = shape[:2]
+    top, right, bottom, left = (int(round(value * scale)) for value in face_box)
+    return (max(top, 0), min(right, width - 1), min(bottom, height - 1), max(left, 0))
+
+
+def detect_faces(image_np, options, timings):
+    """Run the quality gate and find the face to encode.
+
+    Detection runs on the same small copy the gate measures, and the box is
+    scaled back up for the embedding. Returns ``(reason, metrics, locations)``
+    with ``reason`` None when the frame is usable; stage durations are added
+    to ``timings``.
+    """
+    thresholds = options.get("quality")
+    face_box = options.get("face_box")
+    if not thresholds:
+        if face_box:
+            return None, {}, [face_box]
+        started = time.perf_counter()
+        locations = face_recognition.face_locations(
+            image_np,
+            number_of_times_to_upsample=options.get("upsample", 1),
+            model=options.get("model", "hog"),
+        )
+        timings["detect"] = time.perf_counter() - started
+        return (None if locations else frame_quality.NO_FACE), {}, locations
+
+    started = time.perf_counter()
+    small, step = frame_quality.shrink(image_np, thresholds["detect_side"])
+    reason, metrics = frame_quality.check_image(frame_quality.to_gray(small), thresholds)
+    timings["quality"] = time.perf_counter() - started
+    if reason:
+        return reason, metrics, []
+    if face_box:
+        return frame_quality.check_face(face_box, image_np.shape, thresholds), metrics, [face_box]
+
+    started = time.perf_counter()
+    found = face_recognition.face_locations(
+        np.ascontiguousarray(small),
+        number_of_times_to_upsample=options.get("upsample", 1),
+        model=options.get("model", "hog"),
+    )
+    timings["detect"] = time.perf_counter() - started
+    if not found:
+        return frame_quality.NO_FACE, metrics, []
+    location = frame_quality.largest(found)
+    reason = frame_quality.check_face(location, small.shape, thresholds)
+    height, width = image_np.shape[:2]
+    top, right, bottom, left = (value * step for value in location)
+    return reason, metrics, [(max(top, 0), min(right, width - 1), min(bottom, height - 1), max(left, 0))]
+
+
+def encode_faces(image_bytes, options=None, submitted_at=None):
+    if face_recognition is None:
+        init_worker()
+    started_at = time.time()
+    options = dict(options or {})
+    face_box = options.get("face_box")
+    timings = {}
+    started = time.perf_counter()
+    image_np, scale = load_image(
+        image_bytes,
+        max_side=options.get("max_side"),
+        target_face_px=options.get("target_face_px"),
+        face_box=face_box,
+    )
+    timings["pil_decode"] = time.perf_counter() - started
+    if face_box:
+        # The client already located the face, skip detection entirely
+        options["face_box"] = scale_face_box(face_box, scale, image_np.shape)
+
+    rejected, quality, locations = detect_faces(image_np, options, timings)
+    encodings = []
+    if not rejected:
+        started = time.perf_counter()
+        encodings = face_recognition.face_encodings(image_np, known_face_locations=locations)
+        timings["embed"] = time.perf_counter() - started
+    return {
+        "encodings": encodings,
+        "locations": [tuple(int(round(value / scale)) for value in location) for location in locations],
+        "rejected": rejected,
+        "quality": quality,
+        "timings": timings,
+        "queue_wait": started_at - submitted_at if submitted_at else 0.0,
+    }
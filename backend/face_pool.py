@@ -0,0 +1,121 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import face_pipeline
+
+
+class PoolSaturated(Exception):
+    message = "Face pipeline is busy, retry later"
+
+    def __init__(self, retry_after):
+        super().__init__(self.message)
+        self.retry_after = retry_after
+
+
+class PoolRestarting(PoolSaturated):
+    message = "A face worker stopped and is being replaced, retry later"
+
+
+class FacePool:
+    """Bounded pool of face worker processes.
+
+    ``workers`` processes each preload the dlib models; at most
+    ``queue_depth`` further jobs may wait for a free worker. Anything beyond
+    that raises ``PoolSaturated`` right away instead of queueing. With
+    ``workers=0`` jobs run inline on the request thread, still bounded by
+    ``queue_depth``. A worker that dies breaks the whole executor, so the
+    request that notices swaps in a fresh one and raises ``PoolRestarting``.
+    """
+
+    def __init__(self, workers, queue_depth, retry_after=1, timeout=30, start_method="spawn"):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+        self.timeout = timeout
+        self.start_method = start_method
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_depth)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._executor is not None:
+                return
+            if self.workers == 0:
+                face_pipeline.init_worker()
+                return
+            self._executor = self._new_executor()
+        # Spawn every worker and load its models before traffic arrives
+        list(self._executor.map(face_pipeline.warm_up, range(self.workers)))
+        print(f"⚙️ Face pool ready with {self.workers} workers")
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(self.start_method),
+            initializer=face_pipeline.init_worker,
+        )
+
+    def _replace(self, executor):
+        # Several requests can see the same broken executor; only the first
+        # one replaces it. New workers load their models on first use
+        with self._lock:
+            if self._executor is not executor:
+                return
+            print("⚠️ A face worker died, restarting the face pool")
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+
+    def ready(self):
+        """Whether jobs can be submitted; a broken executor is replaced."""
+        if self.workers == 0:
+            return True
+        executor = self._executor
+        if executor is None:
+            return False
+        if executor._broken:
+            self._replace(executor)
+            return False
+        return True
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    def run(self, fn, *args):
+        """Run ``fn(*args, submitted_at)`` on the pool and wait for its result."""
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated(self.retry_after)
+        submitted_at = time.time()
+        if self.workers == 0:
+            try:
+                return fn(*args, submitted_at)
+            finally:
+                self._slots.release()
+
+        if self._executor is None:
+            self.start()
+        executor = self._executor
+        try:
+            future = executor.submit(fn, *args, submitted_at)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._replace(executor)
+            raise PoolRestarting(self.retry_after)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except BrokenProcessPool:
+            self._replace(executor)
+            raise PoolRestarting(self.retry_after)
+
+    def encode_faces(self, image_bytes, options=None):
+        return self.run(face_pipeline.encode_faces, image_bytes, options)
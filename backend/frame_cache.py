@@ -0,0 +1,124 @@
+import io
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8
+# Face boxes are compared on a coarse grid so jitter between frames is ignored
+BOX_GRID = 16
+
+
+# Side the face region is decoded at before it is hashed
+FACE_HASH_PX = 64
+
+
+def _dhash(img):
+    pixels = np.asarray(img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR), dtype=np.int16)
+    bits = np.packbits(pixels[:, 1:] > pixels[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def frame_hash(image_bytes):
+    """64-bit difference hash of the frame's grayscale thumbnail.
+
+    JPEGs are decoded at 1/8 scale straight from the DCT (``draft``), so
+    this costs well under a millisecond even for full-size camera frames.
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+    if img.format == "JPEG":
+        img.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+    return _dhash(img)
+
+
+def face_hash(image_bytes, location):
+    """Difference hash of just the face at ``location`` (top, right, bottom,
+    left in frame pixels), decoded no larger than the hash needs."""
+    img = Image.open(io.BytesIO(image_bytes))
+    width, height = img.size
+    top, right, bottom, left = location
+    if img.format == "JPEG":
+        shrink = FACE_HASH_PX / max(min(right - left, bottom - top), 1)
+        img.draft("L", (max(int(width * shrink), 1), max(int(height * shrink), 1)))
+    scale = img.size[0] / width
+    return _dhash(img.crop((int(left * scale), int(top * scale), int(right * scale) + 1, int(bottom * scale) + 1)))
+
+
+def coarse_box(face_box):
+    if face_box is None:
+        return None
+    return tuple(value // BOX_GRID for value in face_box)
+
+
+class FrameCache:
+    """Recent pipeline results per client, looked up by frame similarity.
+
+    A kiosk pointed at one person sends a burst of nearly identical frames.
+    Each result that produced an embedding is kept for ``ttl`` seconds under
+    the frame's difference hash, and a later frame from the same client
+    reuses it instead of running detection and embedding again when
+
+    * its frame hash is within ``max_distance`` bits,
+    * its face box, when the client sends one, falls on the same coarse
+      grid cell, and
+    * the region where the cached result found the face hashes within
+      ``max_distance`` bits of the face the result was computed from.
+
+    The face check keeps a different person stepping into the same framing
+    from inheriting the previous embedding; it compares pixels, not
+    identities, so a near-identical lookalike in the same spot within
+    ``ttl`` can still be reused. Rejected frames are never cached, because
+    a thumbnail hash barely changes with blur or exposure. Matching still
+    runs on every request.
+
+    Memory is bounded: at most ``per_client`` entries for each of the
+    ``max_clients`` most recently seen clients.
+    """
+
+    def __init__(self, ttl=3.0, max_clients=256, per_client=4, max_distance=3):
+        self.ttl = ttl
+        self.max_clients = max_clients
+        self.per_client = per_client
+        self.max_distance = max_distance
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, client, image_bytes, fingerprint, face_box=None):
+        box = coarse_box(face_box)
+        now = time.monotonic()
+        with self._lock:
+            entries = self._clients.get(client)
+            if not entries:
+                return None
+            self._clients.move_to_end(client)
+            entries[:] = [entry for entry in entries if entry[0] > now]
+            candidates = [
+                entry for entry in reversed(entries)
+                if entry[2] == box and (entry[1] ^ fingerprint).bit_count() <= self.max_distance
+            ]
+        for _, _, _, cached_face, result in candidates:
+            if (face_hash(image_bytes, result["locations"][0]) ^ cached_face).bit_count() <= self.max_distance:
+                return result
+        return None
+
+    def put(self, client, image_bytes, fingerprint, result, face_box=None):
+        if result["rejected"] or not result["encodings"] or not result["locations"]:
+            return
+        cached_face = face_hash(image_bytes, result["locations"][0])
+        with self._lock:
+            entries = self._clients.setdefault(client, [])
+            self._clients.move_to_end(client)
+            entries.append((time.monotonic() + self.ttl, fingerprint, coarse_box(face_box), cached_face, result))
+            del entries[:-self.per_client]
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(entries) for entries in self._clients.values())
@@ -0,0 +1,101 @@
+"""Cheap NumPy checks that reject unusable frames before the embedding runs.
+
+Every check works on a small grayscale copy of the frame, so the whole gate
+costs a few milliseconds. Rejections carry a stable reason code the
+frontends can map to a hint ("move closer", "more light", ...).
+"""
+import numpy as np
+
+DEFAULT_THRESHOLDS = {
+    "min_sharpness": 15.0,       # variance of the Laplacian on the small copy
+    "min_brightness": 40.0,      # mean gray level, 0-255
+    "max_brightness": 220.0,
+    "max_clipped": 0.25,         # share of pixels crushed to black or blown to white
+    "min_face_fraction": 0.12,   # face box height relative to frame height
+    "max_center_offset": 0.35,   # face centre distance from frame centre, relative
+    "detect_side": 320,          # longest side of the detection/measurement copy
+}
+
+BLURRY = "blurry"
+TOO_DARK = "too_dark"
+OVEREXPOSED = "overexposed"
+NO_FACE = "no_face"
+FACE_TOO_SMALL = "face_too_small"
+OFF_CENTER = "off_center"
+
+MESSAGES = {
+    BLURRY: "Image is too blurry, hold the camera still",
+    TOO_DARK: "Image is too dark, move to a brighter spot",
+    OVEREXPOSED: "Image is overexposed, avoid direct light",
+    NO_FACE: "No face detected",
+    FACE_TOO_SMALL: "Face is too small, move closer to the camera",
+    OFF_CENTER: "Face is not centered in the frame",
+}
+
+
+class FrameRejected(Exception):
+    """A frame failed the quality gate; ``reason`` is one of the codes above."""
+
+    def __init__(self, reason, metrics=None):
+        super().__init__(MESSAGES.get(reason, reason))
+        self.reason = reason
+        self.metrics = metrics or {}
+
+
+def shrink(image_np, detect_side):
+    """Integer-stride subsample so the longest side is about ``detect_side``."""
+    step = max(1, max(image_np.shape[:2]) // detect_side)
+    return image_np[::step, ::step], step
+
+
+def to_gray(image_np):
+    if image_np.ndim == 2:
+        return image_np.astype(np.float32)
+    return image_np[..., :3].astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def sharpness(gray):
+    laplacian = (
+        gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]
+        - 4 * gray[1:-1, 1:-1]
+    )
+    return float(laplacian.var())
+
+
+def exposure(gray):
+    total = gray.size
+    return (
+        float(gray.mean()),
+        float(np.count_nonzero(gray <= 8)) / total,
+        float(np.count_nonzero(gray >= 247)) / total,
+    )
+
+
+def check_image(gray, thresholds):
+    """Sharpness and exposure checks; returns ``(reason or None, metrics)``."""
+    brightness, dark_share, bright_share = exposure(gray)
+    metrics = {"sharpness": round(sharpness(gray), 1), "brightness": round(brightness, 1)}
+    if brightness < thresholds["min_brightness"] or dark_share > thresholds["max_clipped"]:
+        return TOO_DARK, metrics
+    if brightness > thresholds["max_brightness"] or bright_share > thresholds["max_clipped"]:
+        return OVEREXPOSED, metrics
+    if metrics["sharpness"] < thresholds["min_sharpness"]:
+        return BLURRY, metrics
+    return None, metrics
+
+
+def check_face(location, shape, thresholds):
+    """Size and position checks for a ``(top, right, bottom, left)`` box."""
+    height, width = shape[:2]
+    top, right, bottom, left = location
+    if (bottom - top) / height < thresholds["min_face_fraction"]:
+        return FACE_TOO_SMALL
+    offset_x = abs((left + right) / 2 - width / 2) / width
+    offset_y = abs((top + bottom) / 2 - height / 2) / height
+    if max(offset_x, offset_y) > thresholds["max_center_offset"]:
+        return OFF_CENTER
+    return None
+
+
+def largest(locations):
+    return max(locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
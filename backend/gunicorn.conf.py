@@ -0,0 +1,41 @@
+"""Production server settings, run from ``backend/``::
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Every setting can be overridden through the environment variables below.
+"""
+import multiprocessing
+import os
+
+# Numeric libraries default to one thread per core in every worker, which
+# oversubscribes the machine once there is a worker per core. These must be
+# set before numpy or dlib are imported, which the preload below does.
+THREAD_LIMIT = os.getenv("WORKER_THREAD_LIMIT", "1")
+for name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS"):
+    os.environ.setdefault(name, THREAD_LIMIT)
+
+# The preforked workers take the place of the face process pool: faces are
+# encoded inline, with the models each worker inherited from the master.
+# Set FACE_POOL_WORKERS to run a separate pool inside every worker instead.
+os.environ.setdefault("FACE_POOL_WORKERS", "0")
+
+bind = os.getenv("BIND", "0.0.0.0:6000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# A few threads per worker overlap Airtable round trips; face encoding
+# itself stays bounded by the face pool's queue depth
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+certfile = os.getenv("SSL_CERTFILE") or None
+keyfile = os.getenv("SSL_KEYFILE") or None
+
+
+def post_fork(server, worker):
+    from app import start_background_services
+    start_background_services(forked=True)
@@ -0,0 +1,148 @@
+"""Rewrite stored face encodings into the current format and key.
+
+Streams the registration table a page at a time, re-encodes every
+``FaceEncoding`` that is legacy or under an older key, and writes the
+changes back ten records per Airtable call. The position and counts are
+saved to a progress file after every page, so a stopped run resumes where
+it left off. Records under the primary key are skipped by their prefix
+alone, so even a run restarted from the first page is cheap.
+
+Changing the stored format needs ``--format``: then every record under the
+primary key is decrypted to read its format, and rewritten if it differs.
+Records that are rewritten anyway use ``--format`` or ``ENCODING_FORMAT``.
+
+Key rotation, run from ``backend/``::
+
+    python migrate_encodings.py --add-key        # new primary key, then migrate
+    # restart the servers so new registrations use the new key
+    python migrate_encodings.py --retire-keys    # migrate stragglers, drop old keys
+
+Running servers pick up a key they have not seen from the keyring file on
+their own; only writes need the restart. ``--retire-keys`` only removes old
+keys after a complete pass found nothing left that needs them.
+"""
+import argparse
+import json
+import os
+
+from cryptography.fernet import Fernet
+
+from airtable import PAGE_SIZE
+from encoding_codec import FORMATS, read_keys, write_keys
+
+
+def load_progress(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"offset": None, "counts": {}}
+
+
+def save_progress(path, progress):
+    if not path:
+        return
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(progress, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def add_key(codec):
+    """Make a fresh key the primary one; existing keys stay for decrypting."""
+    keys = read_keys(codec.keyring_path, codec.legacy_key_path)
+    write_keys(codec.keyring_path, [Fernet.generate_key()] + keys)
+    codec.reload()
+    print(f"🔑 New primary key {codec.primary_id} added to {codec.keyring_path}")
+
+
+def retire_keys(codec):
+    write_keys(codec.keyring_path, [codec.primary_key])
+    codec.reload()
+    print(f"🔑 Keyring now holds only {codec.primary_id}")
+
+
+def migrate(client, table, codec, format=None, progress_path=None, dry_run=False):
+    """One pass over ``table``; returns the counts for the whole run.
+    Without ``format`` only the key is checked."""
+    progress = load_progress(progress_path)
+    counts = progress["counts"]
+    params = {"fields[]": ["FaceEncoding"], "pageSize": PAGE_SIZE}
+    while True:
+        if progress["offset"]:
+            params["offset"] = progress["offset"]
+        else:
+            params.pop("offset", None)
+        res = client.rate_limited(client.get, table, params=params)
+        if res.status_code == 422 and progress["offset"]:
+            # Airtable offsets expire; migrated records are skipped cheaply on the way back
+            print("↩️ Saved position expired, starting over from the first page")
+            progress["offset"] = None
+            continue
+        res.raise_for_status()
+        data = res.json()
+
+        updates = []
+        for record in data.get("records", []):
+            stored = record["fields"].get("FaceEncoding")
+            if not stored:
+                status = "empty"
+            elif codec.is_current(stored, format):
+                status = "current"
+            else:
+                try:
+                    updates.append({"id": record["id"], "fields": {"FaceEncoding": codec.encode(codec.decode(stored), format)}})
+                    continue
+                except Exception as e:
+                    print(f"⚠️ Cannot decode {record['id']}:", e)
+                    status = "unreadable"
+            counts[status] = counts.get(status, 0) + 1
+
+        if dry_run:
+            counts["would_migrate"] = counts.get("would_migrate", 0) + len(updates)
+            updates = []
+        for batch, res in client.update_batches(table, updates):
+            status = "migrated" if res.status_code == 200 else "failed"
+            if status == "failed":
+                print("❌ Update batch failed:", res.status_code, res.text)
+            counts[status] = counts.get(status, 0) + len(batch)
+
+        progress["offset"] = data.get("offset")
+        save_progress(progress_path, progress)
+        print(f"🔁 {counts}")
+        if not progress["offset"]:
+            break
+
+    if progress_path and os.path.exists(progress_path):
+        os.remove(progress_path)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-encode stored face encodings into the current format and key.")
+    parser.add_argument("--format", choices=sorted(FORMATS), help="also rewrite records stored in another format (default: ENCODING_FORMAT, key changes only)")
+    parser.add_argument("--add-key", action="store_true", help="generate a new primary key before migrating")
+    parser.add_argument("--retire-keys", action="store_true", help="drop old keys once nothing uses them")
+    parser.add_argument("--progress", default="encodings.migration", help="progress file for resuming")
+    parser.add_argument("--dry-run", action="store_true", help="count what would change without writing")
+    args = parser.parse_args(argv)
+    if args.add_key and args.retire_keys:
+        # Running workers keep writing with the old key until they restart
+        # with the new one, so it can't be retired in the same run
+        parser.error("--retire-keys can't be combined with --add-key; retire old keys in a later run")
+
+    # The app module holds the configured client, table and codec
+    import app
+
+    if args.add_key:
+        add_key(app.codec)
+    counts = migrate(app.airtable, app.AIRTABLE_TABLE_NAME, app.codec, args.format, args.progress, args.dry_run)
+    print(f"✅ Migration pass finished: {counts}")
+
+    if args.retire_keys:
+        if args.dry_run or counts.get("unreadable") or counts.get("failed") or counts.get("would_migrate"):
+            print("⚠️ Keeping old keys: some records still need them")
+        else:
+            retire_keys(app.codec)
+
+
+if __name__ == "__main__":
+    main()
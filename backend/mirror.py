@@ -0,0 +1,270 @@
+import datetime
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+
+# Mirrored tables and the fields pulled out into indexed columns
+TABLES = {
+    "users": {"email": "Email", "digital_id": "DigitalID", "timestamp": "Timestamp"},
+    "logs": {"user_id": "user_id", "event": "event", "timestamp": "timestamp"},
+}
+INDEXES = {
+    "users": [("email",), ("digital_id",), ("timestamp",)],
+    "logs": [("user_id", "timestamp"), ("event", "timestamp"), ("timestamp",)],
+}
+# Re-read records modified slightly before the watermark to absorb clock skew
+SYNC_OVERLAP = datetime.timedelta(seconds=60)
+LEASE_SECONDS = 120
+
+
+def _utc_now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _iso(dt):
+    return dt.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+class AirtableMirror:
+    """Local SQLite replica of the registration and logs tables.
+
+    A background worker keeps it current: every ``interval`` seconds it pulls
+    records whose ``LAST_MODIFIED_TIME()`` is past the last watermark, and
+    every ``full_interval`` seconds it re-reads both tables in full, which is
+    how deletions made directly in Airtable are noticed. Only one process
+    sharing the file syncs at a time (a lease row arbitrates). Local writes
+    are applied straight away through ``upsert``/``delete``.
+
+    ``version()`` increases on every change and is shared by every process
+    using the file, so it doubles as a change counter for conditional GETs.
+    """
+
+    def __init__(self, path, client, table_names, interval=30, full_interval=900):
+        self.path = path
+        self.client = client
+        self.table_names = table_names
+        self.interval = interval
+        self.full_interval = full_interval
+        self._owner = uuid.uuid4().hex
+        self._thread = None
+        self._ready = False
+        with closing(self._connect()) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            for kind, columns in TABLES.items():
+                extra = "".join(f", {column} TEXT" for column in columns)
+                db.execute(f"CREATE TABLE IF NOT EXISTS {kind} (id TEXT PRIMARY KEY, created_time TEXT, fields TEXT NOT NULL{extra}, written REAL)")
+                if "written" not in {row[1] for row in db.execute(f"PRAGMA table_info({kind})")}:
+                    db.execute(f"ALTER TABLE {kind} ADD COLUMN written REAL")
+                for index in INDEXES[kind]:
+                    db.execute(f"CREATE INDEX IF NOT EXISTS {kind}_{'_'.join(index)} ON {kind} ({', '.join(index)})")
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS sync_state (
+                    kind TEXT PRIMARY KEY,
+                    watermark TEXT,
+                    last_full REAL,
+                    lease_owner TEXT,
+                    lease_until REAL
+                )"""
+            )
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+            db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0)")
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.row_factory = sqlite3.Row
+        return db
+
+    @property
+    def ready(self):
+        """True once syncing runs in this process and both tables have
+        completed a full sync at least once."""
+        if self._thread is None:
+            return False
+        if not self._ready:
+            with closing(self._connect()) as db:
+                done = db.execute("SELECT COUNT(*) FROM sync_state WHERE last_full IS NOT NULL").fetchone()[0]
+            self._ready = done == len(TABLES)
+        return self._ready
+
+    def version(self):
+        with closing(self._connect()) as db:
+            return db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    # Writes ------------------------------------------------------------------
+
+    def _row(self, kind, record):
+        fields = record.get("fields", {})
+        values = [record["id"], record.get("createdTime"), json.dumps(fields)]
+        for column, field in TABLES[kind].items():
+            value = fields.get(field)
+            if column == "email" and value:
+                value = value.strip().lower()
+            values.append(value)
+        values.append(time.time())
+        return values
+
+    def _upsert_rows(self, db, kind, records):
+        columns = ["id", "created_time", "fields", *TABLES[kind], "written"]
+        placeholders = ", ".join("?" for _ in columns)
+        db.executemany(
+            f"INSERT OR REPLACE INTO {kind} ({', '.join(columns)}) VALUES ({placeholders})",
+            [self._row(kind, record) for record in records],
+        )
+
+    def _bump(self, db):
+        db.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+
+    def upsert(self, kind, records):
+        records = [record for record in records if record.get("id")]
+        if not records:
+            return
+        with closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            self._upsert_rows(db, kind, records)
+            self._bump(db)
+            db.execute("COMMIT")
+
+    def delete(self, kind, record_id):
+        with closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute(f"DELETE FROM {kind} WHERE id = ?", (record_id,))
+            self._bump(db)
+            db.execute("COMMIT")
+
+    # Reads -------------------------------------------------------------------
+
+    @staticmethod
+    def _record(row):
+        return {"id": row["id"], "createdTime": row["created_time"], "fields": json.loads(row["fields"])}
+
+    def _field_expression(self, kind, field):
+        """SQL for a field plus its parameters; fields without a column are
+        read from the JSON with the path bound, never pasted into the SQL."""
+        for column, name in TABLES[kind].items():
+            if name.lower() == field.lower():
+                return column, []
+        return "json_extract(fields, ?)", ['$."' + field.replace('"', "") + '"']
+
+    def get(self, kind, record_id):
+        with closing(self._connect()) as db:
+            row = db.execute(f"SELECT * FROM {kind} WHERE id = ?", (record_id,)).fetchone()
+        return self._record(row) if row else None
+
+    def query(self, kind, equals=None, search=None, search_fields=(), order_desc="timestamp", limit=None, offset=0):
+        """Records matching every ``equals`` field and, if given, containing
+        ``search`` (case-insensitively) in any of ``search_fields``."""
+        clauses, args = [], []
+        for field, value in (equals or {}).items():
+            expression, params = self._field_expression(kind, field)
+            if expression == "email":
+                value = value.strip().lower()
+            clauses.append(f"{expression} = ?")
+            args.extend([*params, value])
+        if search:
+            ors = []
+            for field in search_fields:
+                expression, params = self._field_expression(kind, field)
+                ors.append(f"instr(lower({expression}), lower(?)) > 0")
+                args.extend([*params, search])
+            clauses.append("(" + " OR ".join(ors) + ")")
+        sql = f"SELECT * FROM {kind}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if order_desc:
+            expression, params = self._field_expression(kind, order_desc)
+            sql += f" ORDER BY {expression} DESC, id"
+            args.extend(params)
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            args.extend([limit, offset])
+        with closing(self._connect()) as db:
+            return [self._record(row) for row in db.execute(sql, args)]
+
+    def changed_since(self, kind, cursor=None):
+        """Records inserted or rewritten after ``cursor``, by this or any other
+        process, and the cursor to pass next time. Without a cursor only the
+        current position is returned."""
+        with closing(self._connect()) as db:
+            if cursor is None:
+                return db.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {kind}").fetchone()[0], []
+            rows = db.execute(f"SELECT rowid, * FROM {kind} WHERE rowid > ? ORDER BY rowid", (cursor,)).fetchall()
+        if not rows:
+            return cursor, []
+        return rows[-1]["rowid"], [self._record(row) for row in rows]
+
+    def count(self, kind):
+        with closing(self._connect()) as db:
+            return db.execute(f"SELECT COUNT(*) FROM {kind}").fetchone()[0]
+
+    # Sync --------------------------------------------------------------------
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="airtable-mirror", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.sync_once()
+            except Exception as e:
+                print("❌ Mirror sync error:", e)
+            time.sleep(self.interval)
+
+    def _take_lease(self, db, kind):
+        now = time.time()
+        db.execute("INSERT OR IGNORE INTO sync_state (kind) VALUES (?)", (kind,))
+        taken = db.execute(
+            "UPDATE sync_state SET lease_owner = ?, lease_until = ? WHERE kind = ? AND (lease_owner IS NULL OR lease_owner = ? OR lease_until < ?)",
+            (self._owner, now + LEASE_SECONDS, kind, self._owner, now),
+        ).rowcount
+        return bool(taken)
+
+    def sync_once(self):
+        for kind, table in self.table_names.items():
+            with closing(self._connect()) as db:
+                if not self._take_lease(db, kind):
+                    continue
+                state = db.execute("SELECT watermark, last_full FROM sync_state WHERE kind = ?", (kind,)).fetchone()
+            started = _utc_now()
+            try:
+                if state["last_full"] is None or time.time() - state["last_full"] > self.full_interval:
+                    self._full_sync(kind, table, started)
+                else:
+                    self._incremental_sync(kind, table, state["watermark"], started)
+            finally:
+                with closing(self._connect()) as db:
+                    db.execute("UPDATE sync_state SET lease_owner = NULL WHERE kind = ? AND lease_owner = ?", (kind, self._owner))
+
+    def _full_sync(self, kind, table, started):
+        records = self.client.list_all(table)
+        ids = {record["id"] for record in records}
+        with closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            # Rows written through locally after the read began may simply
+            # not have been in it; the next full sync settles those
+            existing = {row[0] for row in db.execute(f"SELECT id FROM {kind} WHERE written IS NULL OR written < ?", (started.timestamp(),))}
+            db.executemany(f"DELETE FROM {kind} WHERE id = ?", [(record_id,) for record_id in existing - ids])
+            self._upsert_rows(db, kind, records)
+            self._bump(db)
+            db.execute(
+                "UPDATE sync_state SET watermark = ?, last_full = ? WHERE kind = ?",
+                (_iso(started - SYNC_OVERLAP), time.time(), kind),
+            )
+            db.execute("COMMIT")
+        print(f"🪞 Mirror full sync of {kind}: {len(records)} records")
+
+    def _incremental_sync(self, kind, table, watermark, started):
+        records = self.client.list_all(table, {"filterByFormula": f"IS_AFTER(LAST_MODIFIED_TIME(), '{watermark}')"})
+        with closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            if records:
+                self._upsert_rows(db, kind, records)
+                self._bump(db)
+            db.execute("UPDATE sync_state SET watermark = ? WHERE kind = ?", (_iso(started - SYNC_OVERLAP), kind))
+            db.execute("COMMIT")
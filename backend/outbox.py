@@ -0,0 +1,200 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+
+from airtable import BATCH_SIZE, retry_after
+
+CLAIM_SECONDS = 120
+
+
+class AirtableOutbox:
+    """Durable write-behind queue for Airtable record creation.
+
+    ``enqueue`` only appends a row to a local SQLite file; a background
+    thread claims up to ``BATCH_SIZE`` rows for the same table, hands them to
+    ``sender(table, records, upsert_on)`` and deletes them once Airtable
+    accepts them. Claims are leases, so rows held by a crashed process (or
+    another worker sharing the file) become due again after
+    ``CLAIM_SECONDS``. ``on_sent(table, records)`` receives every batch Airtable accepted.
+    A batch Airtable refuses outright is retried a row at a time, and only
+    the rows it still refuses are parked with the error.
+
+    Delivery is at-least-once. When ``dedup_field`` names a text field in the
+    target table, every row carries a stable id in that field and is sent as
+    an upsert merged on it, which makes retries after a crash idempotent.
+    """
+
+    def __init__(self, path, sender, dedup_field=None, poll_interval=1.0, on_sent=None):
+        self.path = path
+        self.sender = sender
+        self.on_sent = on_sent
+        self.dedup_field = dedup_field
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._thread = None
+        self._owner = uuid.uuid4().hex
+        self._paused_until = 0
+        with closing(self._connect()) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    uid TEXT NOT NULL,
+                    tbl TEXT NOT NULL,
+                    fields TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt REAL NOT NULL DEFAULT 0,
+                    claimed_by TEXT,
+                    failed TEXT
+                )"""
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (failed, next_attempt, id)")
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def enqueue(self, table, fields):
+        with closing(self._connect()) as db:
+            db.execute(
+                "INSERT INTO outbox (uid, tbl, fields, created) VALUES (?, ?, ?, ?)",
+                (uuid.uuid4().hex, table, json.dumps(fields), time.time()),
+            )
+        self._wake.set()
+
+    def pending(self):
+        with closing(self._connect()) as db:
+            return db.execute("SELECT COUNT(*) FROM outbox WHERE failed IS NULL").fetchone()[0]
+
+    def find(self, table, since=0, **equals):
+        """Fields of unsent rows for ``table`` queued after ``since`` (epoch
+        seconds) whose fields equal ``equals``; the file is shared, so this
+        sees rows queued by every process using it."""
+        sql = "SELECT fields FROM outbox WHERE failed IS NULL AND tbl = ? AND created >= ?"
+        args = [table, since]
+        for field, value in equals.items():
+            sql += " AND json_extract(fields, ?) = ?"
+            args.extend(['$."' + field.replace('"', "") + '"', value])
+        with closing(self._connect()) as db:
+            return [json.loads(row[0]) for row in db.execute(sql, args)]
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="airtable-outbox", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                sent = self.flush_once()
+            except Exception as e:
+                print("❌ Outbox writer error:", e)
+                sent = 0
+            if not sent:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _claim(self):
+        now = time.time()
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT tbl FROM outbox WHERE failed IS NULL AND next_attempt <= ? ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None, []
+            table = row[0]
+            rows = db.execute(
+                "SELECT id, uid, fields, attempts FROM outbox WHERE failed IS NULL AND next_attempt <= ? AND tbl = ? ORDER BY id LIMIT ?",
+                (now, table, BATCH_SIZE),
+            ).fetchall()
+            db.executemany(
+                "UPDATE outbox SET claimed_by = ?, next_attempt = ?, attempts = attempts + 1 WHERE id = ?",
+                [(self._owner, now + CLAIM_SECONDS, row[0]) for row in rows],
+            )
+            db.execute("COMMIT")
+            return table, rows
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+
+    def flush_once(self):
+        """Send one batch; returns the number of records Airtable accepted."""
+        if time.time() < self._paused_until:
+            return 0
+        table, rows = self._claim()
+        if not rows:
+            return 0
+        return self._deliver(table, rows)
+
+    def _deliver(self, table, rows):
+        records = []
+        for _, uid, fields, _ in rows:
+            fields = json.loads(fields)
+            if self.dedup_field:
+                fields[self.dedup_field] = uid
+            records.append(fields)
+        ids = [(row[0],) for row in rows]
+        backoff = min(2 ** max(row[3] for row in rows), 300)
+
+        try:
+            res = self.sender(table, records, self.dedup_field)
+        except Exception as e:
+            print("⚠️ Outbox send failed, will retry:", e)
+            self._retry(ids, backoff)
+            return 0
+
+        if res.status_code == 200:
+            with closing(self._connect()) as db:
+                db.executemany("DELETE FROM outbox WHERE id = ?", ids)
+            print(f"📤 Outbox wrote {len(rows)} records to {table}")
+            if self.on_sent:
+                self.on_sent(table, res.json().get("records", []))
+            return len(rows)
+        if res.status_code == 429:
+            # The sender already waited out what it could; back off for longer
+            wait = retry_after(res)
+            print(f"⏳ Airtable rate limited the outbox, pausing {wait}s")
+            self._paused_until = time.time() + wait
+            self._retry(ids, wait)
+            return 0
+        if res.status_code >= 500:
+            print("⚠️ Airtable error, will retry:", res.status_code, res.text)
+            self._retry(ids, backoff)
+            return 0
+
+        if len(rows) > 1:
+            # Airtable refuses the whole batch over a single bad row; send the
+            # rows one at a time so only the bad ones get parked
+            print("⚠️ Outbox batch rejected, retrying its rows one by one:", res.status_code, res.text)
+            sent = 0
+            for position, row in enumerate(rows):
+                if time.time() < self._paused_until:
+                    self._retry([(other[0],) for other in rows[position:]], self._paused_until - time.time())
+                    break
+                sent += self._deliver(table, [row])
+            return sent
+
+        # Anything else is a request Airtable will never accept, park it
+        print("❌ Outbox record rejected:", res.status_code, res.text)
+        with closing(self._connect()) as db:
+            db.executemany("UPDATE outbox SET failed = ? WHERE id = ?", [(res.text, row_id) for row_id, in ids])
+        return 0
+
+    def _retry(self, ids, delay):
+        with closing(self._connect()) as db:
+            db.executemany(
+                "UPDATE outbox SET claimed_by = NULL, next_attempt = ? WHERE id = ?",
+                [(time.time() + delay, row_id) for row_id, in ids],
+            )
@@ -0,0 +1,114 @@
+import datetime
+import threading
+import time
+
+import pytz
+
+
+class ScanCache:
+    """Local answers for the two lookups every ``/facescanner`` call makes.
+
+    * users by email (and record id), filled on first lookup or by local
+      registrations, dropped by local updates and deletes
+    * for each ``(event, day)`` the users already checked in, loaded once
+      from Airtable and then kept current by local log writes
+
+    Entries expire after ``ttl`` seconds so changes made outside this process
+    are picked up eventually. Check-ins recorded locally are kept for the rest
+    of the day even across reloads, because the outbox may not have written
+    them to Airtable yet. Days roll over in ``timezone``.
+    """
+
+    def __init__(self, ttl=300, timezone="Asia/Jakarta"):
+        self.ttl = ttl
+        self.timezone = pytz.timezone(timezone)
+        self._lock = threading.Lock()
+        self._users = {}
+        self._emails = {}
+        self._checkins = {}
+
+    def today(self):
+        return datetime.datetime.now(self.timezone).date()
+
+    def day_bounds(self, day=None):
+        """UTC ISO bounds of a local day, in the format the logs table uses."""
+        day = day or self.today()
+        start = self.timezone.localize(datetime.datetime.combine(day, datetime.time.min))
+        end = self.timezone.localize(datetime.datetime.combine(day, datetime.time.max))
+        return (
+            start.astimezone(pytz.utc).isoformat().replace("+00:00", "Z"),
+            end.astimezone(pytz.utc).isoformat().replace("+00:00", "Z"),
+        )
+
+    # Users -------------------------------------------------------------------
+
+    def get_user(self, email=None, record_id=None):
+        with self._lock:
+            if email is not None:
+                record_id = self._emails.get(email)
+            entry = self._users.get(record_id)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            return entry[1]
+
+    def put_user(self, record):
+        email = (record.get("fields", {}).get("Email") or "").strip().lower()
+        with self._lock:
+            self._drop_user(record["id"])
+            self._users[record["id"]] = (time.monotonic() + self.ttl, record)
+            if email:
+                self._emails[email] = record["id"]
+
+    def invalidate_user(self, record_id):
+        with self._lock:
+            self._drop_user(record_id)
+
+    def _drop_user(self, record_id):
+        entry = self._users.pop(record_id, None)
+        if entry is not None:
+            email = (entry[1].get("fields", {}).get("Email") or "").strip().lower()
+            if self._emails.get(email) == record_id:
+                del self._emails[email]
+
+    # Check-ins ---------------------------------------------------------------
+
+    def checked_in(self, event, user_id, loader):
+        """Return today's log fields for ``user_id`` at ``event``, or None.
+
+        ``loader(event, day_start, day_end)`` fetches every log record of the
+        day when the cached set is missing or expired.
+        """
+        entry = self._checkin_entry(event)
+        if entry["expires"] < time.monotonic():
+            remote = {}
+            for record in loader(event, *self.day_bounds(entry["day"])):
+                fields = record.get("fields", {})
+                if fields.get("user_id"):
+                    remote.setdefault(fields["user_id"], fields)
+            with self._lock:
+                entry["remote"] = remote
+                entry["expires"] = time.monotonic() + self.ttl
+        return entry["local"].get(user_id) or entry["remote"].get(user_id)
+
+    def mark_checked_in(self, fields):
+        entry = self._checkin_entry(fields.get("event"))
+        with self._lock:
+            entry["local"].setdefault(fields.get("user_id"), fields)
+
+    def forget_checkins(self, user_id):
+        # A log was edited or deleted behind our back: reload every day's set
+        with self._lock:
+            for entry in self._checkins.values():
+                entry["local"].pop(user_id, None)
+                entry["expires"] = 0
+
+    def _checkin_entry(self, event):
+        today = self.today()
+        with self._lock:
+            # Anything keyed on an earlier day is dead once the day rolls over
+            for key in [key for key in self._checkins if key[1] != today]:
+                del self._checkins[key]
+            return self._checkins.setdefault(
+                (event, today),
+                {"day": today, "expires": 0, "remote": {}, "local": {}},
+            )
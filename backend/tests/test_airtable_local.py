@@ -0,0 +1,55 @@
+import pytest
+
+from airtable import AirtableClient
+from airtable_local import compile_formula
+
+
+def record(modified="2026-01-01T12:00:00.000Z", **fields):
+    return {"id": "rec1", "createdTime": modified, "fields": fields, "_modified": modified}
+
+
+ALICE = record(Name="Alice Smith", Email="alice@example.com", event="Expo", timestamp="2026-03-02T09:30:00.000Z", confidence_score=0.31)
+
+
+@pytest.mark.parametrize("formula, expected", [
+    ("{email} = 'alice@example.com'", True),
+    ("{EMAIL}='ALICE@example.com'", False),
+    ("{Name} != 'Bob'", True),
+    ("{missing} = ''", True),
+    ("{confidence_score} < 0.5", True),
+    ("{confidence_score} >= 1", False),
+    ("FIND(LOWER('SMITH'), LOWER({Name}))", True),
+    ("FIND('smith', {Name})", False),
+    ("OR(FIND(LOWER('x'), LOWER({Name})), FIND(LOWER('example'), LOWER({Email})))", True),
+    ("AND({event} = 'Expo', NOT({Name} = 'Bob'))", True),
+    ("AND({event}='Expo',IS_AFTER({timestamp}, '2026-03-02T00:00:00Z'),IS_BEFORE({timestamp}, '2026-03-03T00:00:00Z'))", True),
+    ("IS_AFTER({timestamp}, 'not a date')", False),
+    ("IS_AFTER(LAST_MODIFIED_TIME(), '2025-12-31T00:00:00.000Z')", True),
+    ("{event} & '-' & {Name} = \"Expo-Alice Smith\"", True),
+    ("({Name} = 'Alice Smith') = TRUE", True),
+    ("FALSE", False),
+])
+def test_formula(formula, expected):
+    assert bool(compile_formula(formula)(ALICE)) == expected
+
+
+@pytest.mark.parametrize("formula", ["{a} = ", "SUM({a})", "AND({a} = 'x'", "{a} = 'x')", "{a} ~ 1"])
+def test_unsupported_formulas_are_rejected(formula):
+    with pytest.raises(ValueError):
+        compile_formula(formula)
+
+
+def test_client_lists_through_the_stand_in():
+    client = AirtableClient("appTest", "token", api_url="local://airtable")
+    for n in range(160):
+        client.local.insert("Logs", {"event": "Expo" if n % 3 else "Other", "Timestamp": f"2026-03-02T09:{n // 60:02d}:{n % 60:02d}.000Z"})
+
+    page = client.list("Logs", {"filterByFormula": "{event} = 'Expo'", "sort[0][field]": "Timestamp", "sort[0][direction]": "desc"})
+    assert len(page["records"]) == 100 and page["offset"]
+    assert [record["fields"]["Timestamp"] for record in page["records"][:2]] == ["2026-03-02T09:02:38.000Z", "2026-03-02T09:02:37.000Z"]
+    records = client.list_all("Logs", {"filterByFormula": "{event} = 'Expo'"})
+    assert len(records) == 106
+    assert {record["fields"]["event"] for record in records} == {"Expo"}
+
+    response = client.get("Logs", params={"filterByFormula": "{event} = "})
+    assert response.status_code == 422
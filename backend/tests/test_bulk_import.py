@@ -0,0 +1,62 @@
+import csv
+import zipfile
+
+import pytest
+from cryptography.fernet import Fernet
+
+pytest.importorskip("face_recognition")
+
+import frame_quality
+from airtable import AirtableClient
+from benchmarks import synthetic
+from bulk_import import CREATED, REJECTED, BulkImporter, ImportProgress
+from encoding_codec import EncodingCodec, write_keys
+from face_index import FaceIndex
+
+TABLE = "Registration"
+OPTIONS = {"model": "hog", "upsample": 1, "max_side": 640, "target_face_px": 150, "quality": None}
+
+
+def write_import(tmp_path, photos):
+    csv_path = tmp_path / "attendees.csv"
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "email", "phone"])
+        for index in range(len(photos)):
+            writer.writerow([f"Attendee {index}", f"attendee{index}@example.com", f"08{index:010d}"])
+    zip_path = tmp_path / "photos.zip"
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        for index, photo in enumerate(photos):
+            archive.writestr(f"attendee{index}@example.com.jpg", photo)
+    return str(csv_path), str(zip_path)
+
+
+def make_importer(tmp_path, workers):
+    keyring = str(tmp_path / "secret.keyring")
+    write_keys(keyring, [Fernet.generate_key()])
+    client = AirtableClient("appTest", "token", api_url="local://airtable")
+    importer = BulkImporter(
+        client, TABLE, EncodingCodec(keyring), FaceIndex(), OPTIONS, 0.45,
+        known_emails={}, make_digital_id=lambda: "BIL-1000", workers=workers,
+    )
+    return importer, client
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_import_survives_a_corrupt_photo(tmp_path, workers):
+    photos = [synthetic.face_image(1), b"not an image", synthetic.face_image(2)]
+    csv_path, zip_path = write_import(tmp_path, photos)
+    importer, client = make_importer(tmp_path, workers)
+
+    counts = importer.run(csv_path, zip_path, str(tmp_path / "progress.jsonl"))
+
+    rows = ImportProgress(str(tmp_path / "progress.jsonl")).rows
+    assert sum(counts.values()) == len(photos)
+    assert rows[2]["status"] == REJECTED
+    assert rows[2]["reason"].startswith("unreadable photo")
+    for number in (1, 3):
+        # A detector that misses a synthetic face may reject it, nothing else
+        assert rows[number]["status"] == CREATED or rows[number]["reason"] == frame_quality.NO_FACE
+    created = [row["record_id"] for row in rows.values() if row["status"] == CREATED]
+    assert sorted(created) == sorted(client.local.table(TABLE))
+    assert all(record_id in importer.face_index for record_id in created)
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+
+from airtable import AirtableClient
+from encoding_codec import ENCODING_DIM, EncodingCodec, key_id, read_keys, write_keys
+from migrate_encodings import add_key, migrate, retire_keys
+
+
+def encoding(seed=0):
+    return np.random.default_rng(seed).normal(0, 0.09, ENCODING_DIM)
+
+
+@pytest.fixture
+def codec(tmp_path):
+    keyring = tmp_path / "encoding.keys"
+    write_keys(str(keyring), [Fernet.generate_key()])
+    return EncodingCodec(str(keyring), format="f32")
+
+
+def test_f32_round_trip(codec):
+    value = encoding()
+    stored = codec.encode(value)
+    assert stored.startswith(f"fe2.{codec.primary_id}.")
+    np.testing.assert_allclose(codec.decode(stored), value.astype(np.float32))
+
+
+def test_i8_stays_well_inside_the_match_tolerance(codec):
+    value = encoding()
+    stored = codec.encode(value, "i8")
+    assert len(stored) < len(codec.encode(value, "f32"))
+    assert np.linalg.norm(codec.decode(stored) - value) < 0.01
+    assert codec.is_current(stored) and codec.is_current(stored, "i8")
+    assert not codec.is_current(stored, "f32")
+
+
+def test_legacy_records_still_decode(codec):
+    value = encoding()
+    legacy = Fernet(codec.primary_key).encrypt(value.tobytes()).decode()
+    assert codec.key_of(legacy) is None
+    assert not codec.is_current(legacy)
+    np.testing.assert_array_equal(codec.decode(legacy), value)
+
+
+def test_decode_many_skips_unreadable_rows(codec):
+    values = [codec.encode(encoding(1)), "fe2.deadbeef.nope", codec.encode(encoding(2), "i8")]
+    matrix, ok = codec.decode_many(values)
+    assert matrix.dtype == np.float32 and matrix.shape == (3, ENCODING_DIM)
+    assert list(ok) == [True, False, True]
+    assert not matrix[1].any()
+
+
+def test_codec_follows_keys_added_by_another_process(codec):
+    other = EncodingCodec(codec.keyring_path)
+    add_key(other)
+    stored = other.encode(encoding())
+    assert codec.key_of(stored) != codec.primary_id
+    np.testing.assert_allclose(codec.decode(stored), encoding().astype(np.float32))
+    assert codec.primary_id == other.primary_id
+
+
+def test_key_rotation_migrates_every_record(codec):
+    client = AirtableClient("appTest", "token", api_url="local://airtable")
+    old_key = codec.primary_key
+    for seed in range(25):
+        client.local.insert("Registration", {"FaceEncoding": codec.encode(encoding(seed))}, record_id=f"rec{seed:02d}")
+    legacy = Fernet(old_key).encrypt(encoding(99).tobytes()).decode()
+    client.local.insert("Registration", {"FaceEncoding": legacy}, record_id="recLegacy")
+    client.local.insert("Registration", {"Name": "No face yet"}, record_id="recEmpty")
+
+    add_key(codec)
+    assert read_keys(codec.keyring_path)[1:] == [old_key]
+    counts = migrate(client, "Registration", codec)
+    assert counts == {"migrated": 26, "empty": 1}
+
+    retire_keys(codec)
+    assert read_keys(codec.keyring_path) == [codec.primary_key]
+    records = client.local.table("Registration")
+    for seed in range(25):
+        stored = records[f"rec{seed:02d}"]["fields"]["FaceEncoding"]
+        assert codec.key_of(stored) == key_id(codec.primary_key)
+        np.testing.assert_allclose(codec.decode(stored), encoding(seed).astype(np.float32))
+    np.testing.assert_allclose(codec.decode(records["recLegacy"]["fields"]["FaceEncoding"]), encoding(99).astype(np.float32))
+    with pytest.raises(InvalidToken):
+        codec.decode(legacy)
@@ -0,0 +1,164 @@
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+import pytest
+from cryptography.fernet import Fernet
+
+from encoding_snapshot import EncodingSnapshot
+from face_index import ENCODING_DIM, FaceIndex
+
+KEY = Fernet.generate_key()
+
+
+def encodings(count, seed=0):
+    return np.random.default_rng(seed).normal(0, 0.09, (count, ENCODING_DIM)).astype(np.float32)
+
+
+def store(path, key=KEY, **options):
+    return EncodingSnapshot(str(path), Fernet(key), key, **options)
+
+
+class Loader:
+    def __init__(self, users):
+        self.users = users
+        self.calls = 0
+        self.gate = None
+
+    def __call__(self):
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        return list(self.users)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "face_index.snap"
+
+
+def test_workers_see_each_others_changes(path):
+    # Two indexes on one snapshot stand in for two gunicorn workers
+    matrix = encodings(4)
+    loader = Loader([("rec0", matrix[0]), ("rec1", matrix[1])])
+    first = FaceIndex(loader=loader, store=store(path))
+    second = FaceIndex(loader=loader, store=store(path))
+    first.ensure_loaded()
+    second.ensure_loaded()
+    assert loader.calls == 1
+
+    first.upsert("rec2", matrix[2])
+    first.upsert("rec1", matrix[3])
+    assert first.remove("rec0")
+
+    # Nothing reaches another worker until it syncs with the store
+    assert "rec2" not in second
+    second.ensure_loaded()
+    assert sorted(second.snapshot()[0]) == ["rec1", "rec2"]
+    assert second.distance_to("rec1", matrix[3]) == 0.0
+    assert second.query(matrix[2], k=1)[0][0] == "rec2"
+
+
+def add_from_another_process(path, key, record_id, encoding):
+    index = FaceIndex(store=store(path, key))
+    index.ensure_loaded()
+    index.upsert(record_id, encoding)
+
+
+def test_delta_log_is_replayed_across_processes(path):
+    matrix = encodings(2)
+    index = FaceIndex(loader=Loader([("rec0", matrix[0])]), store=store(path))
+    index.ensure_loaded()
+
+    process = multiprocessing.get_context("spawn").Process(target=add_from_another_process, args=(str(path), KEY, "rec1", matrix[1]))
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+
+    assert "rec1" not in index
+    index.ensure_loaded()
+    assert len(index) == 2
+    assert index.distance_to("rec1", matrix[1]) == 0.0
+
+
+def test_delta_log_is_encrypted(path):
+    index = FaceIndex(loader=Loader([]), store=store(path))
+    index.ensure_loaded()
+    index.upsert("rec0", encodings(1)[0])
+    assert encodings(1)[0].tobytes() not in (path.parent / "face_index.snap.delta").read_bytes()
+
+
+def test_log_is_compacted_into_the_snapshot(path):
+    matrix = encodings(20)
+    first = FaceIndex(loader=Loader([("rec0", matrix[0])]), store=store(path, compact_bytes=2048))
+    second = FaceIndex(store=store(path, compact_bytes=2048))
+    first.ensure_loaded()
+    second.ensure_loaded()
+    built = first._store._built
+
+    for row in range(1, 20):
+        first.upsert(f"rec{row}", matrix[row])
+    first.remove("rec0")
+
+    assert os.path.getsize(f"{path}.delta") < 2048
+    assert first._store._built == built
+    assert len(first._base[0]) > 1
+
+    reopened = FaceIndex(store=store(path))
+    reopened.ensure_loaded()
+    second.ensure_loaded()
+    for index in (reopened, second):
+        assert len(index) == 19
+        assert "rec0" not in index
+        assert index.distance_to("rec19", matrix[19]) == 0.0
+
+
+def test_snapshot_for_another_key_is_rebuilt(path):
+    loader = Loader([("rec0", encodings(1)[0])])
+    FaceIndex(loader=loader, store=store(path)).ensure_loaded()
+
+    other_key = Fernet.generate_key()
+    index = FaceIndex(loader=loader, store=store(path, other_key))
+    index.ensure_loaded()
+    assert loader.calls == 2
+    assert len(index) == 1
+
+
+def test_stale_snapshot_is_served_while_it_rebuilds(path):
+    matrix = encodings(3)
+    loader = Loader([("rec0", matrix[0])])
+    FaceIndex(loader=loader, store=store(path)).ensure_loaded()
+
+    # Records added straight in Airtable only arrive with a rebuild
+    loader.users = [("rec0", matrix[0]), ("rec1", matrix[1])]
+    loader.gate = threading.Event()
+    index = FaceIndex(loader=loader, store=store(path, max_age=0))
+    index.ensure_loaded()
+    assert index.snapshot()[0] == ["rec0"]
+
+    loader.gate.set()
+    with index._rebuilding:
+        pass
+    assert loader.calls == 2
+    index._store.max_age = 3600
+
+    index.upsert("rec2", matrix[2])
+    index.ensure_loaded()
+    assert sorted(index.snapshot()[0]) == ["rec0", "rec1", "rec2"]
+
+
+def test_rebuild_keeps_changes_logged_while_reading(path):
+    matrix = encodings(3)
+    snapshot = store(path)
+    index = FaceIndex(loader=Loader([("rec0", matrix[0])]), store=snapshot)
+    index.ensure_loaded()
+
+    def slow_loader():
+        # Another worker registers someone while the source is being read
+        snapshot.append_upsert("rec2", matrix[2])
+        return [("rec0", matrix[0]), ("rec1", matrix[1])]
+
+    assert snapshot.rebuild(slow_loader)
+    index.ensure_loaded()
+    assert sorted(index.snapshot()[0]) == ["rec0", "rec1", "rec2"]
@@ -0,0 +1,57 @@
+import numpy as np
+
+from face_index import ENCODING_DIM, FaceIndex
+
+
+def encodings(count, seed=0):
+    return np.random.default_rng(seed).normal(0, 0.09, (count, ENCODING_DIM)).astype(np.float32)
+
+
+def test_loader_builds_one_sorted_base_segment():
+    matrix = encodings(50)
+    users = [(f"rec{index:03d}", matrix[index]) for index in reversed(range(50))]
+    index = FaceIndex(loader=lambda: users)
+    index.ensure_loaded()
+
+    base_ids, base_matrix, dead = index._base
+    assert list(base_ids) == sorted(base_ids)
+    assert base_matrix.shape == (50, ENCODING_DIM)
+    assert dead is None and len(index._extra[0]) == 0
+    assert len(index) == 50
+    assert index.query(matrix[7], k=1)[0][0] == "rec007"
+    np.testing.assert_array_equal(index.get("rec031"), matrix[31])
+
+
+def test_duplicate_ids_keep_the_last_encoding():
+    first, second = encodings(2)
+    index = FaceIndex()
+    index.rebuild([("recA", first), ("recA", second)])
+    assert len(index) == 1
+    np.testing.assert_array_equal(index.get("recA"), second)
+
+
+def test_upserts_and_removes_over_the_base():
+    matrix = encodings(10)
+    index = FaceIndex()
+    index.rebuild([(f"rec{i}", matrix[i]) for i in range(5)])
+
+    index.upsert("rec2", matrix[9])
+    index.upsert("rec7", matrix[7])
+    assert index.remove("rec0")
+    assert not index.remove("missing")
+
+    assert len(index) == 5
+    assert "rec0" not in index
+    assert index.distance_to("rec2", matrix[9]) == 0.0
+    assert index.query(matrix[2], k=1, tolerance=0.01) == []
+    assert index.query(matrix[7], k=2)[0] == ("rec7", 0.0)
+    record_ids, snapshot = index.snapshot()
+    assert sorted(record_ids) == ["rec1", "rec2", "rec3", "rec4", "rec7"]
+    assert snapshot.shape == (5, ENCODING_DIM)
+
+
+def test_empty_index_answers_queries():
+    index = FaceIndex()
+    index.rebuild([])
+    assert len(index) == 0
+    assert index.query(encodings(1)[0]) == []
@@ -0,0 +1,31 @@
+import io
+
+import pytest
+from PIL import Image
+
+from face_pipeline import frame_size, load_image
+
+
+def encoded(img, format="PNG"):
+    buffer = io.BytesIO()
+    img.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("mode", ["RGB", "L", "RGBA", "P", "1", "I;16"])
+def test_any_mode_is_reduced_to_rgb(mode):
+    image_np, scale = load_image(encoded(Image.new(mode, (1200, 800))), max_side=300)
+    assert image_np.shape == (200, 300, 3)
+    assert scale == 0.25
+
+
+def test_jpeg_is_drafted_towards_the_face_size():
+    image_np, scale = load_image(encoded(Image.new("RGB", (1600, 1200)), "JPEG"), target_face_px=100, face_box=(0, 400, 400, 0))
+    assert image_np.shape[2] == 3
+    assert 400 <= image_np.shape[1] <= 500
+    assert scale == image_np.shape[1] / 1600
+
+
+def test_frame_size_reads_the_header():
+    assert frame_size(encoded(Image.new("RGB", (640, 480)), "JPEG")) == (640, 480)
+    assert frame_size(b"not an image") is None
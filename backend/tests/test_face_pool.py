@@ -0,0 +1,58 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import face_pipeline
+from face_pool import FacePool, PoolRestarting
+
+
+def echo(value, submitted_at):
+    return value
+
+
+def crash(submitted_at):
+    os._exit(1)
+
+
+def warm_up(*_):
+    return True
+
+
+class ModelFreePool(FacePool):
+    # Skips the dlib models so the pool itself can be tested anywhere
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(self.start_method))
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(face_pipeline, "warm_up", warm_up)
+    pool = ModelFreePool(workers=1, queue_depth=2, retry_after=3, timeout=30)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def test_a_dead_worker_is_replaced(pool):
+    assert pool.run(echo, "before") == "before"
+    broken = pool._executor
+
+    with pytest.raises(PoolRestarting) as raised:
+        pool.run(crash)
+    assert raised.value.retry_after == 3
+    assert pool._executor is not broken
+
+    assert pool.run(echo, "after") == "after"
+    assert pool.ready()
+
+
+def test_ready_replaces_a_broken_executor(pool):
+    broken = pool._executor
+    broken._broken = "a worker died"
+
+    assert not pool.ready()
+    assert pool._executor is not broken
+    assert pool.ready()
+    assert pool.run(echo, 1) == 1
@@ -0,0 +1,152 @@
+import json
+import sqlite3
+import time
+
+import pytest
+
+import outbox
+from outbox import CLAIM_SECONDS, AirtableOutbox
+
+
+class Clock:
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+
+class Response:
+    def __init__(self, status_code, records=(), headers=None):
+        self.status_code = status_code
+        self.records = list(records)
+        self.headers = headers or {}
+        self.text = json.dumps({"error": status_code})
+
+    def json(self):
+        return {"records": self.records}
+
+
+class Sender:
+    """Records every call and answers with ``respond(records)``."""
+
+    def __init__(self, respond=None):
+        self.calls = []
+        self.respond = respond or (lambda records: Response(200, records))
+
+    def __call__(self, table, records, upsert_on):
+        self.calls.append((table, [dict(record) for record in records], upsert_on))
+        return self.respond(records)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(outbox, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "outbox.sqlite3")
+
+
+def rows(path):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT fields, attempts, claimed_by, failed FROM outbox ORDER BY id").fetchall()
+
+
+def test_rows_are_sent_in_batches_per_table(path, clock):
+    sent = []
+    sender = Sender()
+    box = AirtableOutbox(path, sender, dedup_field="Outbox ID", on_sent=lambda table, records: sent.append((table, len(records))))
+    for n in range(12):
+        box.enqueue("Logs", {"n": n})
+    box.enqueue("Other", {"n": 99})
+
+    assert box.flush_once() == 10
+    assert box.flush_once() == 2
+    assert box.flush_once() == 1
+    assert box.flush_once() == 0
+
+    assert [(table, len(records)) for table, records, _ in sender.calls] == [("Logs", 10), ("Logs", 2), ("Other", 1)]
+    assert sent == [("Logs", 10), ("Logs", 2), ("Other", 1)]
+    first = sender.calls[0][1][0]
+    assert sender.calls[0][2] == "Outbox ID" and len(first["Outbox ID"]) == 32
+    assert rows(path) == []
+
+
+def test_a_claim_is_a_lease(path, clock):
+    AirtableOutbox(path, Sender()).enqueue("Logs", {"n": 1})
+    crashed = AirtableOutbox(path, Sender())
+    table, claimed = crashed._claim()
+    assert table == "Logs" and len(claimed) == 1
+
+    sender = Sender()
+    other = AirtableOutbox(path, sender)
+    assert other.flush_once() == 0
+    assert other.pending() == 1
+
+    clock.now += CLAIM_SECONDS + 1
+    assert other.flush_once() == 1
+    assert sender.calls[0][1] == [{"n": 1}]
+
+
+def test_server_errors_are_retried_with_backoff(path, clock):
+    answers = [Response(503), Response(200, [{}])]
+    box = AirtableOutbox(path, Sender(lambda records: answers.pop(0)))
+    box.enqueue("Logs", {"n": 1})
+
+    assert box.flush_once() == 0
+    _, attempts, claimed_by, failed = rows(path)[0]
+    assert (attempts, claimed_by, failed) == (1, None, None)
+    assert box.flush_once() == 0
+
+    clock.now += 2
+    assert box.flush_once() == 1
+    assert rows(path) == []
+
+
+def test_rate_limits_pause_the_writer(path, clock):
+    answers = [Response(429, headers={"Retry-After": "7"}), Response(200, [{}])]
+    sender = Sender(lambda records: answers.pop(0))
+    box = AirtableOutbox(path, sender)
+    box.enqueue("Logs", {"n": 1})
+
+    assert box.flush_once() == 0
+    clock.now += 6
+    assert box.flush_once() == 0
+    assert len(sender.calls) == 1
+    clock.now += 2
+    assert box.flush_once() == 1
+
+
+def test_a_rejected_batch_is_retried_row_by_row(path, clock):
+    def respond(records):
+        if any(record.get("bad") for record in records):
+            return Response(422)
+        return Response(200, records)
+
+    sender = Sender(respond)
+    box = AirtableOutbox(path, sender)
+    for n in range(4):
+        box.enqueue("Logs", {"n": n, "bad": n == 2})
+
+    assert box.flush_once() == 3
+    assert [len(records) for _, records, _ in sender.calls] == [4, 1, 1, 1, 1]
+    parked = rows(path)
+    assert len(parked) == 1
+    assert json.loads(parked[0][0])["n"] == 2 and parked[0][3]
+    assert box.pending() == 0
+    assert box.flush_once() == 0
+
+
+def test_find_matches_unsent_rows_by_field(path, clock):
+    box = AirtableOutbox(path, Sender())
+    box.enqueue("Logs", {"Email": "a@example.com", "Event": "Expo"})
+    box.enqueue("Logs", {"Email": "b@example.com", "Event": "Expo"})
+    box.enqueue("Other", {"Email": "a@example.com", "Event": "Expo"})
+
+    assert box.find("Logs", Email="a@example.com", Event="Expo") == [{"Email": "a@example.com", "Event": "Expo"}]
+    assert box.find("Logs", since=clock.now + 1, Email="a@example.com") == []
+    assert len(AirtableOutbox(path, Sender()).find("Logs", Event="Expo")) == 2
@@ -0,0 +1,12 @@
+"""WSGI entry point for production: ``gunicorn -c gunicorn.conf.py wsgi:application``.
+
+With ``preload_app`` this module is imported once in the gunicorn master,
+so the cipher, the memory-mapped face index and (with inline encoding) the
+dlib models are loaded and warmed up before any worker forks, and every
+worker shares those pages copy-on-write. Each worker then starts its own
+background threads from the ``post_fork`` hook in ``gunicorn.conf.py``.
+"""
+import app as backend
+
+backend.warm_up()
+application = backend.app